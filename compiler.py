@@ -1,11 +1,67 @@
 """
 Amirali Salimi - 400109384
 """
-from anytree import RenderTree
+import os
+import time
+import argparse
+from contextlib import ExitStack
+from io import StringIO
+from tempfile import TemporaryFile
 from utils.scanner import Scanner
+from utils.regex_scanner import RegexScanner
 from utils.token import Token
 from utils.error import SyntaxError
 from utils.parser import Parser
+from utils.parse_tree import ParseTreeWriter
+from utils.codegen import CodeGenerator
+from utils.temp_codegen import TempCodeGenerator
+
+SCANNERS = {
+    'dfa': Scanner,
+    'regex': RegexScanner,
+}
+
+CODE_GENERATORS = {
+    'stack': CodeGenerator,
+    'temp': TempCodeGenerator,
+}
+
+class CompileResult:
+    def __init__(self, pb, syntax_errors, semantic_errors, lexemes, parse_tree=None):
+        # Three address codes, one Instruction per line of output.txt
+        self.pb = pb
+        # (error, lineno) pairs in the order they were found
+        self.syntax_errors = syntax_errors
+        self.semantic_errors = semantic_errors
+        self.lexemes = lexemes
+        # ParseTree, or the ParseTreeWriter it was streamed to, if it was built
+        self.parse_tree = parse_tree
+
+# on_syntax_error(error, lineno) is called as soon as a syntax error is found,
+# with timeout a TimeoutError is raised once compiling took that many seconds
+def compile_file(fd_in, scanner_backend='dfa', parse_tree=True, tree=None, optimize=False,
+                 code_generator='stack', on_syntax_error=None, timeout=None):
+    scanner = SCANNERS[scanner_backend](fd_in)
+    parser = Parser(scanner, parse_tree, tree, CODE_GENERATORS[code_generator]())
+    syntax_errors = []
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    while not parser.eof_reached():
+        if deadline is not None and time.perf_counter() > deadline:
+            raise TimeoutError('Compile timeout exceeded', timeout)
+        try:
+            parser.proceed()
+        except SyntaxError as se:
+            syntax_errors.append((se, scanner.get_lineno()))
+            if on_syntax_error:
+                on_syntax_error(se, scanner.get_lineno())
+    return CompileResult(parser.get_pb(optimize), syntax_errors, parser.get_semantic_errors(),
+                         scanner.get_lexemes(), parser.get_parse_tree() if parse_tree else None)
+
+# Compiles a program held in memory, nothing is read from or written to disk
+def compile_source(text, scanner_backend='dfa', parse_tree=False, optimize=False,
+                   code_generator='stack'):
+    return compile_file(StringIO(text), scanner_backend, parse_tree, None, optimize,
+                        code_generator)
 
 def write_token(fd_tok, token_type, token_str, lineno, newline=False):
     if token_type == Token.WHITESPACE:
@@ -39,40 +95,51 @@ def write_symbols(fd_sym, lexemes):
             fd_sym.write(str(lineno) + '.\t' + lexeme + '\n')
             lineno += 1
 
-def write_parse_tree(fd_ptree, root):
-    for pre, fill, node in RenderTree(root):
-        fd_ptree.write(f'{pre}{node.name}\n')
+def write_parse_tree(fd_ptree, tree_writer):
+    for pre, name in tree_writer.render():
+        fd_ptree.write(f'{pre}{name}\n')
 
-def run():
-    with open('input.txt', 'r') as fd_in, \
-        open('parse_tree.txt', 'w', encoding='utf-8') as fd_ptree, \
-        open('syntax_errors.txt', 'w') as fd_serr, \
-        open('output.txt', 'w') as fd_out, \
-        open('semantic_errors.txt', 'w') as fd_smerr:
-        scanner = Scanner(fd_in)
-        parser = Parser(scanner)
-        error_found = False
-        while not parser.eof_reached():
-            try:
-                parser.proceed()
-            except SyntaxError as se:
-                error_found = True
-                write_syntax_error(fd_serr, se, scanner.get_lineno())
-        if not error_found:
+# Reads input.txt from and writes the output files to directory
+def run(scanner_backend='dfa', parse_tree=True, optimize=False, code_generator='stack',
+        directory='.', timeout=None):
+    path = lambda filename: os.path.join(directory, filename)
+    with ExitStack() as files:
+        fd_in = files.enter_context(open(path('input.txt'), 'r'))
+        if parse_tree:
+            fd_ptree = files.enter_context(open(path('parse_tree.txt'), 'w', encoding='utf-8'))
+            tree_writer = ParseTreeWriter(files.enter_context(TemporaryFile()))
+        else:
+            tree_writer = None
+        fd_serr = files.enter_context(open(path('syntax_errors.txt'), 'w'))
+        fd_out = files.enter_context(open(path('output.txt'), 'w'))
+        fd_smerr = files.enter_context(open(path('semantic_errors.txt'), 'w'))
+        result = compile_file(fd_in, scanner_backend, parse_tree, tree_writer, optimize,
+                              code_generator,
+                              lambda se, lineno: write_syntax_error(fd_serr, se, lineno),
+                              timeout)
+        if not result.syntax_errors:
             fd_serr.write('There is no syntax error.')
-        write_parse_tree(fd_ptree, parser.get_root_node())
+        if parse_tree:
+            write_parse_tree(fd_ptree, result.parse_tree)
 
-        inter_code = parser.get_pb()
         counter = 0
-        for three_addr_code in inter_code:
+        for three_addr_code in result.pb:
             fd_out.write(f'{counter}\t({three_addr_code})\n')
             counter += 1
 
-        semantic_errors = parser.get_semantic_errors()
-        if semantic_errors:
-            for smerr, lineno in semantic_errors:
+        if result.semantic_errors:
+            for smerr, lineno in result.semantic_errors:
                 write_semantic_error(fd_smerr, smerr, lineno)
         else:
             fd_smerr.write('The input program is semantically correct.')
 if __name__ == '__main__':
-    run()
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--scanner', choices=SCANNERS, default='dfa')
+    arg_parser.add_argument('--no-parse-tree', dest='parse_tree', action='store_false',
+                            help='skip building and writing parse_tree.txt')
+    arg_parser.add_argument('--optimize', action='store_true',
+                            help='remove unreachable code and recomputed values and run the peephole pass over the generated code')
+    arg_parser.add_argument('--codegen', choices=CODE_GENERATORS, default='stack',
+                            help='keep expression results on the stack or in fixed temporaries')
+    args = arg_parser.parse_args()
+    run(args.scanner, args.parse_tree, args.optimize, args.codegen)
\ No newline at end of file
@@ -0,0 +1,340 @@
+import os
+import sys
+import time
+import tracemalloc
+import subprocess
+from io import StringIO
+from tempfile import TemporaryFile, TemporaryDirectory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.dfa import DFA
+from utils.scanner import Scanner
+from utils.regex_scanner import RegexScanner
+from utils.parser import Parser
+from utils.parse_tree import ParseTreeWriter
+from utils.temp_codegen import TempCodeGenerator
+import compiler
+import vm
+import threaded_vm
+
+
+class ProceedDFA(DFA):
+    # Feeds the scanner's chunk to proceed one character at a time
+    def run(self, text: str, pos: int):
+        while pos < len(text):
+            self.proceed(text[pos])
+            if self.is_final() or self.has_error():
+                if not self.is_lookahead():
+                    pos += 1
+                break
+            pos += 1
+        return pos
+
+
+class LinearScanDFA(ProceedDFA):
+    # The transition lookup used before the DFA table existed
+    def proceed(self, next_char: str):
+        for state, char_class, to_state in self.transitions:
+            if state == self.current_state and next_char in char_class:
+                self.current_state = to_state
+                self.current_index = self.state_list.index(to_state)
+                return True
+        self.current_state = self.States.TRASH
+        self.current_index = self.TRASH_INDEX
+        return False
+
+
+def generate_program(size):
+    functions = []
+    length = 0
+    counter = 0
+    while length < size:
+        function = (
+            f'/* function number {counter} */\n'
+            f'int f{counter}(int n) {{\n'
+            f'    int i;\n'
+            f'    int s;\n'
+            f'    int a[4];\n'
+            f'    s = 0;\n'
+            f'    for (i = 0; i < n; i = i + 1) {{\n'
+            f'        a[i - i] = i * 2 + {counter};\n'
+            f'        s = s + a[0];\n'
+            f'    }}\n'
+            f'    if (s < {counter}) s = s + 1; else s = s - 1; endif\n'
+            f'    return s;\n'
+            f'}}\n')
+        functions.append(function)
+        length += len(function)
+        counter += 1
+    functions.append(
+        'void main(void) {\n'
+        f'    output(f0(3) + f{counter - 1}(2));\n'
+        '}\n')
+    return ''.join(functions)
+
+
+def scan(file, scanner_class):
+    scanner = scanner_class(file)
+    is_eof = False
+    while not is_eof:
+        _, _, is_eof = scanner.get_next_token()
+
+
+def scan_with_dfa(file, dfa):
+    scanner = Scanner(file)
+    scanner.dfa = dfa
+    is_eof = False
+    while not is_eof:
+        _, _, is_eof = scanner.get_next_token()
+
+
+def drive(text, dfa):
+    for char in text:
+        dfa.proceed(char)
+        if dfa.is_final():
+            dfa.reset()
+
+
+def measure(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def benchmark_scanner(size):
+    text = generate_program(size)
+    print(f'scanner input: {len(text)} characters')
+    with TemporaryFile('w+') as file:
+        file.write(text)
+        for name, dfa in [('linear scan DFA', LinearScanDFA()), ('table DFA', ProceedDFA())]:
+            proceed = measure(drive, text, dfa)
+            file.seek(0)
+            scanner = measure(scan_with_dfa, file, dfa)
+            print(f'{name:16} proceed: {len(text) / proceed:10.0f} chars/s'
+                  f'  scanner: {len(text) / scanner:10.0f} chars/s')
+        for scanner_class in [Scanner, RegexScanner]:
+            file.seek(0)
+            scanner = measure(scan, file, scanner_class)
+            print(f'{scanner_class.__name__:16} scanner: {len(text) / scanner:10.0f} chars/s')
+
+
+def parse(file, build_tree, tree=None):
+    parser = Parser(Scanner(file), build_tree, tree)
+    while not parser.eof_reached():
+        parser.proceed()
+
+
+def benchmark_parser(size):
+    text = generate_program(size)
+    print(f'parser input: {len(text)} characters')
+    with TemporaryFile('w+') as file, TemporaryFile() as spill:
+        file.write(text)
+        tree_writer = ParseTreeWriter(spill)
+        for name, build_tree, tree in [('parse tree', True, None), ('tree writer', True, tree_writer),
+                                       ('no parse tree', False, None)]:
+            file.seek(0)
+            duration = measure(parse, file, build_tree, tree)
+            file.seek(0)
+            tracemalloc.start()
+            parse(file, build_tree, tree)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f'{name:16} time: {duration:8.2f}s  peak memory: {peak / 2 ** 20:8.1f} MiB')
+
+
+CODEGEN_PROGRAMS = {
+    'recursion': (
+        'int fib(int n) {\n'
+        '    if (n < 2) return n; endif\n'
+        '    return fib(n - 1) + fib(n - 2);\n'
+        '}\n'
+        'void main(void) {\n'
+        '    output(fib(12));\n'
+        '}\n'),
+    'loops': (
+        'int g[16];\n'
+        'void main(void) {\n'
+        '    int i; int j; int s;\n'
+        '    s = 0;\n'
+        '    for (i = 0; i < 16; i = i + 1) g[i] = i * i - 3;\n'
+        '    for (i = 0; i < 40; i = i + 1)\n'
+        '        for (j = 0; j < 16; j = j + 1)\n'
+        '            if (g[j] < i) s = s + g[j] * 2; else s = s - 1; endif\n'
+        '    output(s);\n'
+        '}\n'),
+}
+
+
+class InstructionCounter:
+    def __init__(self):
+        self.count = 0
+
+    def write(self, text):
+        if text.startswith('--->  PC'):
+            self.count += 1
+
+
+def compile_program(text, code_generator=None, optimize=False):
+    parser = Parser(Scanner(StringIO(text)), False, None, code_generator)
+    while not parser.eof_reached():
+        parser.proceed()
+    return parser.get_pb(optimize)
+
+
+def count_instructions(pb):
+    counter = InstructionCounter()
+    vm.run([f'{i}\t({code})\n' for i, code in enumerate(pb)], StringIO(), counter)
+    return counter.count
+
+
+def benchmark_codegen(size):
+    programs = dict(CODEGEN_PROGRAMS, generated=generate_program(size))
+    for name, text in programs.items():
+        print(f'{name}:')
+        for codegen, code_generator_class in [('stack', None), ('temp', TempCodeGenerator)]:
+            for optimize in (False, True):
+                code_generator = code_generator_class and code_generator_class()
+                pb = compile_program(text, code_generator, optimize)
+                label = codegen + (' + peephole' if optimize else '')
+                print(f'  {label:16} program: {len(pb):8} instructions'
+                      f'  executed: {count_instructions(pb):8} instructions')
+
+
+class RedecodingProgram(list):
+    # Decodes an instruction every time it is fetched, as the VM did before
+    # the program was decoded once up front
+    def __getitem__(self, pc):
+        return vm.decode_instruction(super().__getitem__(pc))
+
+
+VM_PROGRAMS = {
+    'loops': (
+        'int a[32];\n'
+        'void main(void) {\n'
+        '    int i; int j; int s;\n'
+        '    s = 0;\n'
+        '    for (i = 0; i < 32; i = i + 1) a[i] = i;\n'
+        '    for (i = 0; i < 400; i = i + 1)\n'
+        '        for (j = 0; j < 32; j = j + 1)\n'
+        '            if (a[j] < 16) s = s + a[j]; else s = s - 1; endif\n'
+        '    output(s);\n'
+        '}\n'),
+    'recursion': (
+        'int fib(int n) {\n'
+        '    if (n < 2) return n; endif\n'
+        '    return fib(n - 1) + fib(n - 2);\n'
+        '}\n'
+        'void main(void) {\n'
+        '    output(fib(18));\n'
+        '}\n'),
+}
+
+
+def execute(program, fast=False, trace_size=0, word_memory=False):
+    with open(os.devnull, 'w') as devnull:
+        vm.execute(program, vm.Context(StringIO(), devnull, fast, trace_size, word_memory))
+
+
+def execute_threaded(program):
+    with open(os.devnull, 'w') as devnull:
+        threaded_vm.ThreadedProgram(program, vm.Context(StringIO(), devnull, True)).execute()
+
+
+def benchmark_vm(size):
+    for program_name, text in VM_PROGRAMS.items():
+        pb = compile_program(text)
+        instructions = [f'{i}\t({code})\n' for i, code in enumerate(pb)]
+        count = count_instructions(pb)
+        print(f'{program_name}: {len(pb)} instructions  executed: {count} instructions')
+        program = vm.decode(instructions)
+        for name, args in [('decode per step', (RedecodingProgram(instructions),)),
+                           ('decoded once', (program,)),
+                           ('fast', (program, True)),
+                           ('fast, last 50', (program, True, 50)),
+                           ('superinstructions', (vm.fuse(program), True))]:
+            duration = measure(execute, *args)
+            print(f'  {name:18} {count / duration:10.0f} instructions/s')
+        duration = measure(execute_threaded, program)
+        print(f'  {"threaded":18} {count / duration:10.0f} instructions/s')
+
+
+MEMORY_PROGRAMS = {
+    'factorial': (
+        'int fact(int n) {\n'
+        '    if (n < 2) return 1; endif\n'
+        '    return n * fact(n - 1);\n'
+        '}\n'
+        'void main(void) {\n'
+        '    int i;\n'
+        '    for (i = 0; i < 400; i = i + 1) output(fact(20));\n'
+        '}\n'),
+    'deep recursion': (
+        'int sum(int n) {\n'
+        '    if (n < 1) return 0; endif\n'
+        '    return n + sum(n - 1);\n'
+        '}\n'
+        'void main(void) {\n'
+        '    output(sum(5000));\n'
+        '}\n'),
+    'fibonacci': (
+        'int fib(int n) {\n'
+        '    if (n < 2) return n; endif\n'
+        '    return fib(n - 1) + fib(n - 2);\n'
+        '}\n'
+        'void main(void) {\n'
+        '    output(fib(17));\n'
+        '}\n'),
+}
+
+
+def benchmark_memory(size):
+    for name, text in MEMORY_PROGRAMS.items():
+        program = vm.decode(f'{i}\t({code})\n' for i, code in enumerate(compile_program(text)))
+        print(f'{name}:')
+        for memory, word_memory in [('dict', False), ('word array', True)]:
+            duration = measure(execute, program, True, 0, word_memory)
+            tracemalloc.start()
+            execute(program, True, 0, word_memory)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f'  {memory:12} time: {duration:8.2f}s  peak memory: {peak / 2 ** 10:8.1f} KiB')
+
+
+def compile_in_processes(text, count):
+    compiler_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 'compiler.py')
+    with TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'input.txt'), 'w') as fd_in:
+            fd_in.write(text)
+        for _ in range(count):
+            subprocess.run([sys.executable, compiler_path], cwd=directory, check=True)
+
+
+def compile_in_process(text, count):
+    for _ in range(count):
+        compiler.compile_source(text)
+
+
+def benchmark_compile(size):
+    text = CODEGEN_PROGRAMS['recursion']
+    for name, func, count in [('compiler.py', compile_in_processes, 20),
+                              ('compile_source', compile_in_process, 2000)]:
+        duration = measure(func, text, count)
+        print(f'{name:16} {count / duration:10.1f} programs/s')
+
+
+BENCHMARKS = {
+    'scanner': benchmark_scanner,
+    'parser': benchmark_parser,
+    'codegen': benchmark_codegen,
+    'vm': benchmark_vm,
+    'memory': benchmark_memory,
+    'compile': benchmark_compile,
+}
+
+if __name__ == '__main__':
+    name = sys.argv[1] if len(sys.argv) > 1 else 'scanner'
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 2 * 1024 * 1024
+    BENCHMARKS[name](size)
@@ -1,17 +1,25 @@
 import re
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 LINE_PATTERN = re.compile(r"(?P<linenum>\d+)\.\s*(?P<content>.+)")
 ERROR_PATTERN = re.compile(r"#(?P<linenum>\d+)\s*:\s*(?P<content>.+)")
+# Bands wider than this are filled by the NumPy kernel when it is installed
+NUMPY_BAND = 64
 
 
+# Penalties are expected to never be positive and match_score to be 0, the
+# defaults and what every scorer below uses, so identical inputs score 0
 def calc_alignment_score(first, second, del_penalty=-1, edit_penalty=-1, match_score=0) -> int:
-    dp = [[(0, -1) for j in range(len(second) + 1)]
-          for i in range(len(first) + 1)]
+    if match_score == 0 and first == second:
+        return 0
 
-    # These are used for tracking the comparison decisions
-    FDEL = 0
-    SDEL = 1
-    MATCH = 2
+    if all(isinstance(penalty, int) and penalty <= 0 for penalty in (del_penalty, edit_penalty)) \
+            and match_score == 0:
+        return __calc_unit_alignment_score(first, second, del_penalty, edit_penalty)
 
     calc_del_penalty = del_penalty
     calc_edit_penalty = edit_penalty
@@ -26,29 +34,103 @@ def calc_alignment_score(first, second, del_penalty=-1, edit_penalty=-1, match_s
     if isinstance(match_score, int):
         def calc_match_score(x, y): return match_score
 
-    for i in range(1, len(first) + 1):
-        dp[i][0] = (calc_del_penalty(first[i - 1]) * i, FDEL)
-
-    for j in range(1, len(second) + 1):
-        dp[0][j] = (calc_del_penalty(second[j - 1]) * j, SDEL)
-
-    dp[0][0] = (0, -1)
-
-    for i in range(1, len(first) + 1):
-        for j in range(1, len(second) + 1):
-            dp[i][j] = max(
-                [
-                    (dp[i - 1][j][0] + calc_del_penalty(first[i - 1]), FDEL),
-                    (dp[i][j - 1][0] + calc_del_penalty(second[j - 1]), SDEL),
-                    (dp[i - 1][j - 1][0] +
-                     (calc_match_score(first[i - 1], second[j - 1])
-                      if first[i - 1] == second[j - 1]
-                      else calc_edit_penalty(first[i - 1], second[j - 1])),
-                     MATCH)
-                ],
-                key=lambda x: x[0])
-
-    return dp[len(first)][len(second)][0]
+    first_del = [calc_del_penalty(x) for x in first]
+    second_del = [calc_del_penalty(y) for y in second]
+
+    # Only the previous row of the table is kept. The first column and row
+    # hold the penalty of their last element times its count
+    previous = [0] + [penalty * j for j, penalty in enumerate(second_del, 1)]
+    for i, x in enumerate(first, 1):
+        x_del = first_del[i - 1]
+        left = x_del * i
+        current = [left]
+        for j, y in enumerate(second, 1):
+            left = max(previous[j] + x_del,
+                       left + second_del[j - 1],
+                       previous[j - 1] + (calc_match_score(x, y) if x == y
+                                          else calc_edit_penalty(x, y)))
+            current.append(left)
+        previous = current
+
+    return previous[-1]
+
+
+# Constant penalties, the common prefix and suffix are matched and only a
+# band of the table around its diagonal is filled. The band is widened
+# until no path leaving it can score better than the one found in it, or
+# gets wide enough for the whole table to be filled row by row in NumPy.
+def __calc_unit_alignment_score(first, second, del_penalty, edit_penalty):
+    start = 0
+    while start < len(first) and start < len(second) and first[start] == second[start]:
+        start += 1
+    end = 0
+    while end < len(first) - start and end < len(second) - start \
+            and first[-1 - end] == second[-1 - end]:
+        end += 1
+    first = first[start:len(first) - end]
+    second = second[start:len(second) - end]
+
+    n, m = len(first), len(second)
+    if not n or not m:
+        return del_penalty * (n + m)
+    if not del_penalty:
+        return 0
+
+    shift = abs(n - m)
+    band = shift + 8
+    while True:
+        if numpy is not None and band > NUMPY_BAND:
+            return __calc_numpy_alignment_score(first, second, del_penalty, edit_penalty)
+        score = __calc_banded_alignment_score(first, second, del_penalty, edit_penalty, band)
+        # A path leaving the band deletes at least this many elements
+        if band >= max(n, m) or score >= del_penalty * (2 * (band + 1) - shift):
+            return score
+        band *= 2
+
+
+def __calc_banded_alignment_score(first, second, del_penalty, edit_penalty, band):
+    m = len(second)
+    unreachable = float('-inf')
+    previous = [unreachable] * (m + 1)
+    current = [unreachable] * (m + 1)
+    for j in range(min(m, band) + 1):
+        previous[j] = del_penalty * j
+    for i, x in enumerate(first, 1):
+        low = max(1, i - band)
+        high = min(m, i + band)
+        if low == 1:
+            left = current[0] = del_penalty * i
+        else:
+            left = unreachable
+        for j in range(low, high + 1):
+            left = max(previous[j] + del_penalty,
+                       left + del_penalty,
+                       previous[j - 1] + (0 if x == second[j - 1] else edit_penalty))
+            current[j] = left
+        previous, current = current, previous
+    return previous[m]
+
+
+# The elements are replaced by integer codes and every row is computed with
+# array operations. Moving left costs del_penalty per cell, so the best of
+# the cells to the left is a running maximum of score - del_penalty * j.
+def __calc_numpy_alignment_score(first, second, del_penalty, edit_penalty):
+    codes = {}
+    first = numpy.array([codes.setdefault(x, len(codes)) for x in first], dtype=numpy.int64)
+    second = numpy.array([codes.setdefault(y, len(codes)) for y in second], dtype=numpy.int64)
+    slope = del_penalty * numpy.arange(len(second) + 1, dtype=numpy.int64)
+    previous = slope.copy()
+    current = numpy.empty_like(previous)
+    for i, x in enumerate(first, 1):
+        current[0] = del_penalty * i
+        numpy.maximum(previous[1:] + del_penalty,
+                      previous[:-1] + numpy.where(second == x, 0, edit_penalty),
+                      out=current[1:])
+        current -= slope
+        numpy.maximum.accumulate(current, out=current)
+        current += slope
+        previous, current = current, previous
+    return int(previous[-1])
 
 
 def extract_line_parts(line: str):
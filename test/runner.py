@@ -1,56 +1,79 @@
 from io import StringIO
 import os
+import sys
+import time
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr
 from subprocess import Popen, PIPE, TimeoutExpired
+from tempfile import TemporaryDirectory
 from threading import Thread
 import evaluator
 import shutil
 import vm
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import compiler
+
 INPUT_CODE_FILENAME = 'input.txt'
 COMPILER_OUTPUT_FILENAME = 'output.txt'
 PROGRAM_OUTPUT_FILENAME = 'expected.txt'
 SEMANTIC_ERRORS_FILENAME = 'semantic_errors.txt'
-
-
-def run_and_evaluate(test_name):
-    __compile(test_name)
-
-    if(os.path.exists(__get_path_for_test(test_name, PROGRAM_OUTPUT_FILENAME))):
-        __run()
-        expected_program_output, program_output = __read_expected_and_actual(
-            test_name, PROGRAM_OUTPUT_FILENAME)
-        score1 = evaluator.calc_program_output_score(
-            expected_program_output, program_output)
-        score2 = 0
-        print("Generated Program Output:", program_output)
-        print("Expected Program Output:", expected_program_output)
-    else:
-        expected_errors, errors = __read_expected_and_actual(
-            test_name, SEMANTIC_ERRORS_FILENAME)
-        score1 = 0
-        score2 = evaluator.calc_semantic_errors_score(expected_errors, errors)
+TRACE_SIZE = 50
+PYTHON = './venv/bin/python'
+TESTCASES_DIRECTORY = 'test/testcases'
+COMPILE_TIMEOUT = 5
+VM_TIMEOUT = 10
+# The in-process VM cannot be killed, it gets a budget of instructions
+# instead, about what the VM executes in VM_TIMEOUT seconds
+VM_STEPS_PER_SECOND = 1000000
+
+
+# Every test runs in its own temporary directory, so tests can run at the
+# same time. Paths are resolved against the working directory, the
+# repository root, before the compiler and the VM are started there.
+# in_process calls compiler.run and vm.run in this process instead of
+# starting a Python interpreter for each of them.
+def run_and_evaluate(test_name, fast=False, in_process=False):
+    with TemporaryDirectory() as directory:
+        if in_process:
+            __compile_in_process(test_name, directory)
+        else:
+            __compile(test_name, directory)
+
+        if(os.path.exists(__get_path_for_test(test_name, PROGRAM_OUTPUT_FILENAME))):
+            if in_process:
+                __run_in_process(directory, fast)
+            else:
+                __run(directory, fast)
+            expected_program_output, program_output = __read_expected_and_actual(
+                test_name, PROGRAM_OUTPUT_FILENAME, directory)
+            score1 = evaluator.calc_program_output_score(
+                expected_program_output, program_output)
+            score2 = 0
+            print("Generated Program Output:", program_output)
+            print("Expected Program Output:", expected_program_output)
+        else:
+            expected_errors, errors = __read_expected_and_actual(
+                test_name, SEMANTIC_ERRORS_FILENAME, directory)
+            score1 = 0
+            score2 = evaluator.calc_semantic_errors_score(expected_errors, errors)
 
     print(test_name, '-->', score1, score2)
     return score1, score2
 
 
-def __compile(test_name):
+def __compile(test_name, directory):
     shutil.copyfile(
         __get_path_for_test(test_name, INPUT_CODE_FILENAME),
-        f'./{INPUT_CODE_FILENAME}')
-
-    for file_name in [
-            COMPILER_OUTPUT_FILENAME,
-            PROGRAM_OUTPUT_FILENAME,
-            # SEMANTIC_ERRORS_FILENAME
-            ]:
-        if os.path.exists(file_name):
-            os.remove(file_name)
+        os.path.join(directory, INPUT_CODE_FILENAME))
 
     compiler_process = Popen(
-        ['./venv/bin/python', 'compiler.py'], stdout=PIPE, stderr=PIPE)
+        [os.path.abspath(PYTHON), os.path.abspath('compiler.py')],
+        cwd=directory, stdout=PIPE, stderr=PIPE)
     try:
-        out, err = compiler_process.communicate(5)
+        out, err = compiler_process.communicate(timeout=COMPILE_TIMEOUT)
     except TimeoutExpired:
         compiler_process.kill()
         raise
@@ -58,9 +81,27 @@ def __compile(test_name):
     print('Compiler Standard Error:', err)
 
 
-def __run():
-    with open(COMPILER_OUTPUT_FILENAME, 'r') as generated_codes, \
-            open(PROGRAM_OUTPUT_FILENAME, 'w') as output, \
+# Every compile builds a new Scanner, Parser, Grammar state and
+# CodeGenerator, so nothing is left over from the previous test
+def __compile_in_process(test_name, directory):
+    shutil.copyfile(
+        __get_path_for_test(test_name, INPUT_CODE_FILENAME),
+        os.path.join(directory, INPUT_CODE_FILENAME))
+
+    try:
+        compiler.run(parse_tree=False, directory=directory, timeout=COMPILE_TIMEOUT)
+    except TimeoutError:
+        raise
+    except Exception:
+        # A crashing compiler process only leaves its traceback on stderr
+        print('Compiler Standard Error:', traceback.format_exc())
+
+
+# fast runs the VM without writing its execution trace, only the last
+# TRACE_SIZE instructions are reported if the program fails
+def __run(directory, fast=False):
+    with open(os.path.join(directory, COMPILER_OUTPUT_FILENAME), 'r') as generated_codes, \
+            open(os.path.join(directory, PROGRAM_OUTPUT_FILENAME), 'w') as output, \
             open(os.devnull, 'w') as devnull:
         # StringIO() as devnull:
         # t = Thread(
@@ -71,11 +112,12 @@ def __run():
         # if t.is_alive():
         #     raise TimeoutError()
 
+        vm_args = ['--fast', '--trace-last', str(TRACE_SIZE)] if fast else []
         vm_process = Popen(
-            ['./venv/bin/python', 'test/vm.py'],
+            [os.path.abspath(PYTHON), os.path.abspath('test/vm.py')] + vm_args,
             stdin=generated_codes, stdout=output, stderr=PIPE)
         try:
-            _, err = vm_process.communicate(10)
+            _, err = vm_process.communicate(timeout=VM_TIMEOUT)
             if vm_process.returncode != 0:
                 print("VM standard error:", err)
                 raise Exception("Error in running the program")
@@ -84,7 +126,22 @@ def __run():
             raise
 
 
-def __read_expected_and_actual(test_name: str, filename: str):
+def __run_in_process(directory, fast=False):
+    with open(os.path.join(directory, COMPILER_OUTPUT_FILENAME), 'r') as generated_codes, \
+            open(os.path.join(directory, PROGRAM_OUTPUT_FILENAME), 'w') as output, \
+            open(os.devnull, 'w') as devnull, \
+            redirect_stderr(StringIO()) as err:
+        try:
+            vm.run(generated_codes.readlines(), output, err if fast else devnull,
+                   fast, TRACE_SIZE, max_steps=VM_TIMEOUT * VM_STEPS_PER_SECOND)
+        except TimeoutError:
+            raise
+        except Exception:
+            print("VM standard error:", err.getvalue())
+            raise Exception("Error in running the program")
+
+
+def __read_expected_and_actual(test_name: str, filename: str, directory: str):
     if not filename.endswith('.txt'):
         filename = f'{filename}.txt'
 
@@ -93,10 +150,51 @@ def __read_expected_and_actual(test_name: str, filename: str):
             return f.read()
 
     expected = read(__get_path_for_test(test_name, filename))
-    actual = read(filename)
+    actual = read(os.path.join(directory, filename))
 
     return expected, actual
 
 
 def __get_path_for_test(test_name: str, filename: str):
-    return os.path.join('test/testcases', test_name, filename)
+    return os.path.join(TESTCASES_DIRECTORY, test_name, filename)
+
+
+def __run_timed(test_name, fast, in_process):
+    start = time.perf_counter()
+    try:
+        scores = run_and_evaluate(test_name, fast, in_process)
+    except Exception as e:
+        scores = e
+    return test_name, scores, time.perf_counter() - start
+
+
+# Runs the tests on a pool of processes, one per core unless processes is
+# given, and returns {test_name: (score1, score2) or the raised exception}
+def run_all(test_names=None, processes=None, fast=False, in_process=False):
+    if test_names is None:
+        test_names = sorted(os.listdir(TESTCASES_DIRECTORY))
+    results = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(processes) as executor:
+        futures = [executor.submit(__run_timed, test_name, fast, in_process) for test_name in test_names]
+        for future in as_completed(futures):
+            test_name, scores, duration = future.result()
+            results[test_name] = scores
+            print(f'{test_name:24} {duration:8.2f}s  {scores}', file=sys.stderr)
+    failed = [test_name for test_name, scores in results.items() if scores != (0, 0)]
+    print(f'{len(test_names)} tests, {len(failed)} failed, '
+          f'{time.perf_counter() - start:.2f}s', file=sys.stderr)
+    return results
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('tests', nargs='*', help=f'test names in {TESTCASES_DIRECTORY}, all by default')
+    arg_parser.add_argument('-j', '--processes', type=int, default=None)
+    arg_parser.add_argument('--fast', action='store_true',
+                            help='run the VM without its execution trace')
+    arg_parser.add_argument('--in-process', action='store_true',
+                            help='run the compiler and the VM in the worker processes')
+    args = arg_parser.parse_args()
+    results = run_all(args.tests or None, args.processes, args.fast, args.in_process)
+    sys.exit(any(scores != (0, 0) for scores in results.values()))
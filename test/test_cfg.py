@@ -0,0 +1,72 @@
+import unittest
+from io import StringIO
+from utils.scanner import Scanner
+from utils.parser import Parser
+from utils.temp_codegen import TempCodeGenerator
+from utils import cfg
+from test_peephole import instruction, execute
+
+
+def generate(text, code_generator=None):
+    parser = Parser(Scanner(StringIO(text)), False, None, code_generator)
+    while not parser.eof_reached():
+        parser.proceed()
+    return parser.code_generator
+
+
+class DeadCodeTest(unittest.TestCase):
+    program = (
+        'int g;\n'
+        'int unused(int a) { return unused(a - 1) + 1; }\n'
+        'int f(int n) { if (n < 2) return 1; else return n * f(n - 1); endif return 0; }\n'
+        'void main(void) {\n'
+        '    int i;\n'
+        '    for (i = 0; i < 4; i = i + 1) { output(f(i)); if (i == 2) break; endif }\n'
+        '}\n')
+
+    def test_program(self):
+        for code_generator in (None, TempCodeGenerator()):
+            generator = generate(self.program, code_generator)
+            pb, address_lines = cfg.eliminate_dead_code(generator.PB, generator.address_lines)
+            self.assertEqual(execute(pb), 'PRINT    1\nPRINT    1\nPRINT    2\n')
+            self.assertEqual(execute(pb), execute(generator.PB))
+            self.assertLess(len(pb), len(generator.PB))
+            # The call in unused is gone with it
+            self.assertEqual((len(generator.address_lines), len(address_lines)), (4, 3))
+            for lineno in address_lines:
+                self.assertEqual(pb[lineno].opcode, 'ASSIGN')
+
+    def test_blocks(self):
+        pb = [instruction(text) for text in [
+            'ASSIGN, #4, @500, ',
+            'ADD, 500, #4, 500',
+            'JP, 7, , ',
+            'PRINT, 500, , ',
+            'JP, @508, , ',
+            'JP, 3, , ',
+            'PRINT, #1, , ',
+            'JPF, 600, 3, ',
+            'PRINT, #2, , ',
+        ]]
+        blocks = cfg.build_cfg(pb, [0])
+        self.assertEqual([(block.start, block.end) for block in blocks],
+                         [(0, 3), (3, 4), (4, 5), (5, 6), (6, 7), (7, 8), (8, 9)])
+        self.assertEqual([block.successors for block in blocks], [[5], [2], [], [1], [5], [1, 6], []])
+        self.assertEqual(blocks[0].return_sites, [2])
+        self.assertTrue(blocks[2].returns)
+        self.assertEqual(cfg.reachable_blocks(blocks), [True, True, True, False, False, True, True])
+        pb, address_lines = cfg.eliminate_dead_code(pb, [0])
+        self.assertEqual([str(code) for code in pb], [
+            'ASSIGN, #4, @500, ',
+            'ADD, 500, #4, 500',
+            'JP, 5, , ',
+            'PRINT, 500, , ',
+            'JP, @508, , ',
+            'JPF, 600, 3, ',
+            'PRINT, #2, , ',
+        ])
+        self.assertEqual(address_lines, [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import os
+import unittest
+from io import StringIO
+from utils.scanner import Scanner
+from utils.parser import Parser
+from utils.codegen import CodeGenerator
+from utils.instruction import Instruction, immediate, indirect
+from utils.temp_codegen import TempCodeGenerator
+import vm
+
+
+class InstructionCounter(StringIO):
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def write(self, text):
+        if text.startswith('--->  PC'):
+            self.count += 1
+        return len(text)
+
+
+def compile_program(text, code_generator=None, optimize=False):
+    parser = Parser(Scanner(StringIO(text)), False, None, code_generator)
+    while not parser.eof_reached():
+        parser.proceed()
+    return parser.get_pb(optimize)
+
+
+def execute(pb):
+    output = StringIO()
+    counter = InstructionCounter()
+    vm.run([f'{i}\t({code})\n' for i, code in enumerate(pb)], output, counter)
+    return output.getvalue(), counter.count
+
+
+class TempCodeGeneratorTest(unittest.TestCase):
+    programs = [
+        'int fib(int n) {\n'
+        '    if (n < 2) return n; endif\n'
+        '    return fib(n - 1) + fib(n - 2);\n'
+        '}\n'
+        'void main(void) {\n'
+        '    int i;\n'
+        '    for (i = 0; i < 8; i = i + 1) output(i * fib(i) - -fib(i + 1));\n'
+        '}\n',
+        'int g; int h[3];\n'
+        'int bump(int k) { g = g + k; h[1] = h[1] + 1; return g; }\n'
+        'void main(void) {\n'
+        '    int x; int y; int a[4];\n'
+        '    g = 5; h[1] = 2; x = 1;\n'
+        '    output(g + bump(3));\n'
+        '    output(g + (g = 2) * g);\n'
+        '    output(x + (x = 7) + x);\n'
+        '    output(h[1] + bump(1) + h[1]);\n'
+        '    y = a[2] = x = 4;\n'
+        '    output(y + a[2] + x);\n'
+        '    output(bump(bump(1) + g) - g);\n'
+        '    if (bump(0) == 8) output(1); else output(0); endif\n'
+        '}\n',
+    ]
+
+    def test_programs(self):
+        for text in self.programs:
+            for optimize in (False, True):
+                output, count = execute(compile_program(text, None, optimize))
+                temp_output, temp_count = execute(compile_program(text, TempCodeGenerator(), optimize))
+                self.assertEqual(temp_output, output)
+                self.assertLess(temp_count, count)
+
+    def test_stack_above_temps(self):
+        pb = compile_program(self.programs[0], TempCodeGenerator())
+        stack = pb[0].operands[0][1]
+        self.assertGreater(stack, TempCodeGenerator.TEMPS)
+        self.assertEqual(str(pb[1]), f'ASSIGN, #{stack}, {TempCodeGenerator.FP}, ')
+
+
+
+class ConstantFoldingTest(unittest.TestCase):
+    program = (
+        'int g[12];\n'
+        'void main(void) {\n'
+        '    int x; int a[4];\n'
+        '    x = 3 - -5;\n'
+        '    g[2 * 4 + 1] = x * 1 + 0;\n'
+        '    a[3 - 1] = -(2 < 3) + g[9] * 8;\n'
+        '    output(g[9] - 0 + a[2] + (x == 2 * 4));\n'
+        '}\n')
+
+    def test_folded(self):
+        for code_generator in (None, TempCodeGenerator()):
+            pb = compile_program(self.program, code_generator)
+            self.assertEqual(execute(pb)[0], 'PRINT    72\n')
+            self.assertFalse([code for code in pb
+                              if code.opcode == 'MULT' and immediate(4) in code.operands])
+            self.assertIn('MULT', [code.opcode for code in pb])
+            self.assertNotIn('#0, #5', ''.join(map(str, pb)))
+
+    def test_stack_immediates(self):
+        pb = compile_program(self.program)
+        self.assertIn(Instruction('ASSIGN', immediate(8), indirect(CodeGenerator.SP)), pb)
+        self.assertIn(Instruction('MULT', indirect(CodeGenerator.TEMP), immediate(8),
+                                  indirect(CodeGenerator.TEMP)), pb)
+
+    def test_semantic_errors(self):
+        parser = Parser(Scanner(StringIO('int g[2];\n'
+                                         'void main(void) {\n'
+                                         '    int x;\n'
+                                         '    x = g + 1 * 2;\n'
+                                         '    x = -g;\n'
+                                         '    x = y - 0;\n'
+                                         '}\n')), False)
+        while not parser.eof_reached():
+            parser.proceed()
+        self.assertEqual(parser.get_semantic_errors(), [
+            ('Type mismatch in operands, Got array instead of int.', 4),
+            ('Type mismatch in operands, Got array instead of int.', 5),
+            ("'y' is not defined.", 6),
+        ])
+
+
+class StackDepth(StringIO):
+    def __init__(self):
+        super().__init__()
+        self.depth = 0
+
+    def write(self, text):
+        prefix = f'--->  memory[{CodeGenerator.SP}] = '
+        if text.startswith(prefix):
+            self.depth = max(self.depth, int(text[len(prefix):]))
+        return len(text)
+
+
+class TailCallTest(unittest.TestCase):
+    program = (
+        'int count(int i, int acc) { if (i < 1) return acc; endif return count(i - 1, acc + 2); }\n'
+        'int swap(int a, int b, int k) { if (k < 1) return a * 10 + b; endif return swap(b, a, k - 1); }\n'
+        'int five(void) { return 5; }\n'
+        'int wide(int a, int b, int c) { if (a < 1) return b * c; endif return wide(a - 1, c, b + 1); }\n'
+        'int narrow(int x) { return wide(x, 1, five()) + 0; }\n'
+        'int local(int k) { int b[2]; b[1] = k; if (k < 1) return 7; endif return local(k - 1) + b[1]; }\n'
+        'void main(void) {\n'
+        '    output(count(N, 1));\n'
+        '    output(swap(1, 2, 3) + five());\n'
+        '    output(narrow(3) + local(3));\n'
+        '}\n')
+
+    def depth(self, n, code_generator=None, optimize=False):
+        pb = compile_program(self.program.replace('N', str(n)), code_generator, optimize)
+        output = StringIO()
+        stack_depth = StackDepth()
+        vm.run(pb, output, stack_depth)
+        self.assertEqual(output.getvalue(), f'PRINT    {2 * n + 1}\nPRINT    26\nPRINT    31\n')
+        return stack_depth.depth
+
+    def test_constant_stack(self):
+        for code_generator in (CodeGenerator, TempCodeGenerator):
+            for optimize in (False, True):
+                self.assertEqual(self.depth(3, code_generator(), optimize),
+                                 self.depth(300, code_generator(), optimize))
+
+    def test_calls_kept(self):
+        parser = Parser(Scanner(StringIO(self.program.replace('N', '3'))), False)
+        while not parser.eof_reached():
+            parser.proceed()
+        # count, swap and wide are jumped to, adding 0 emits nothing. five in
+        # the arguments, local in its sum, the calls in main and the call of
+        # main push a return address
+        self.assertEqual(len(parser.code_generator.address_lines), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
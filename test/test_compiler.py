@@ -0,0 +1,58 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from utils.parse_tree import ParseTree, render_tree
+import compiler
+
+
+class CompileSourceTest(unittest.TestCase):
+    program = (
+        'int fact(int n) {\n'
+        '    if (n < 2) return 1; else return n * fact(n - 1); endif\n'
+        '}\n'
+        'void main(void) {\n'
+        '    int i;\n'
+        '    for (i = 0; i < 6; i = i + 1) output(fact(i));\n'
+        '}\n')
+
+    def test_matches_run(self):
+        cwd = os.getcwd()
+        with TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                with open('input.txt', 'w') as fd_in:
+                    fd_in.write(self.program)
+                compiler.run()
+                with open('output.txt') as fd_out, open('parse_tree.txt', encoding='utf-8') as fd_ptree:
+                    output, parse_tree = fd_out.read(), fd_ptree.read()
+            finally:
+                os.chdir(cwd)
+        result = compiler.compile_source(self.program, parse_tree=True)
+        self.assertEqual(''.join(f'{i}\t({code})\n' for i, code in enumerate(result.pb)), output)
+        self.assertIsInstance(result.parse_tree, ParseTree)
+        self.assertEqual(''.join(f'{pre}{name}\n' for pre, name in render_tree(result.parse_tree)),
+                         parse_tree)
+        self.assertEqual(result.syntax_errors, [])
+        self.assertEqual(result.semantic_errors, [])
+        self.assertIn('fact', result.lexemes)
+        self.assertIsNone(compiler.compile_source(self.program).parse_tree)
+
+    def test_errors(self):
+        result = compiler.compile_source('int a;\n'
+                                         'void main(void) {\n'
+                                         '    int b;\n'
+                                         '    b = (2 * 3;\n'
+                                         '    b = z;\n'
+                                         '}\n')
+        self.assertEqual([(str(error), lineno) for error, lineno in result.syntax_errors],
+                         [('Syntax error, missing )', 4)])
+        self.assertEqual(result.semantic_errors, [("'z' is not defined.", 5)])
+
+    def test_repeated(self):
+        first = compiler.compile_source(self.program, code_generator='temp', optimize=True)
+        second = compiler.compile_source(self.program, code_generator='temp', optimize=True)
+        self.assertEqual(first.pb, second.pb)
+
+
+if __name__ == '__main__':
+    unittest.main()
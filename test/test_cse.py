@@ -0,0 +1,78 @@
+import unittest
+from utils.temp_codegen import TempCodeGenerator
+from utils import cfg
+from utils import cse
+from test_peephole import instruction, execute
+from test_cfg import generate
+
+
+class CommonSubexpressionTest(unittest.TestCase):
+    program = (
+        'int g[4];\n'
+        'int square(int n) { return n * n; }\n'
+        'void main(void) {\n'
+        '    int a[10];\n'
+        '    int i;\n'
+        '    int s;\n'
+        '    s = 0;\n'
+        '    for (i = 0; i < 10; i = i + 1) { a[i] = i * i + square(i); if (i < 4) g[i] = i; endif }\n'
+        '    for (i = 6; i < 10; i = i + 1) { s = s + a[i] * a[i]; g[i - 6] = g[i - 6] + a[i]; }\n'
+        '    output(s);\n'
+        '    output(g[0] + g[1] + g[2] * g[3]);\n'
+        '}\n')
+
+    def test_program(self):
+        for code_generator in (None, TempCodeGenerator()):
+            generator = generate(self.program, code_generator)
+            pb, address_lines = cfg.eliminate_dead_code(generator.PB, generator.address_lines)
+            new_pb, new_address_lines = cse.eliminate_common_subexpressions(
+                pb, address_lines, generator.get_registers())
+            self.assertEqual(execute(new_pb), 'PRINT    57416\nPRINT    21621\n')
+            self.assertEqual(execute(generator.get_pb(True)), execute(generator.PB))
+            self.assertLess(len(new_pb), len(pb))
+            self.assertEqual(len(new_address_lines), len(address_lines))
+            for lineno in new_address_lines:
+                self.assertEqual(new_pb[lineno].opcode, 'ASSIGN')
+
+    def test_block(self):
+        pb = [instruction(text) for text in [
+            'ADD, 504, #40, 508',
+            'ASSIGN, @508, @500, ',
+            'ADD, 500, #4, 500',
+            # TEMP still holds the address
+            'ADD, 504, #40, 508',
+            'ASSIGN, 508, @500, ',
+            'ADD, 500, #4, 500',
+            'SUB, 500, #4, 500',
+            # The value pushed is TEMP
+            'ASSIGN, @500, 508, ',
+            'ADD, 504, #40, 512',
+            # 512 and 516 hold what 508 holds
+            'ADD, 504, #40, 516',
+            'MULT, @512, @516, 520',
+            'ASSIGN, 520, 600, ',
+            # 600 may be the element at 508
+            'ASSIGN, @508, 524, ',
+            'JPF, 524, 15, ',
+            'ADD, 504, #40, 508',
+            'PRINT, 600, , ',
+        ]]
+        pb, address_lines = cse.eliminate_common_subexpressions(pb, [], (500, 504, 508, 512, 516, 520, 524))
+        self.assertEqual([str(code) for code in pb], [
+            'ADD, 504, #40, 508',
+            'ASSIGN, @508, @500, ',
+            'ADD, 500, #4, 500',
+            'ASSIGN, 508, @500, ',
+            'ADD, 500, #4, 500',
+            'SUB, 500, #4, 500',
+            'MULT, @508, @508, 520',
+            'ASSIGN, 520, 600, ',
+            'ASSIGN, @508, 524, ',
+            'JPF, 524, 11, ',
+            'ADD, 504, #40, 508',
+            'PRINT, 600, , ',
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
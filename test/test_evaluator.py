@@ -0,0 +1,97 @@
+import random
+import unittest
+from unittest import mock
+import evaluator
+
+
+# The table filling calc_alignment_score did before it kept only two rows
+def reference_alignment_score(first, second, del_penalty=-1, edit_penalty=-1, match_score=0):
+    calc_del_penalty = del_penalty
+    calc_edit_penalty = edit_penalty
+    if isinstance(del_penalty, int):
+        def calc_del_penalty(x): return del_penalty
+    if isinstance(edit_penalty, int):
+        def calc_edit_penalty(x, y): return edit_penalty
+
+    dp = [[0] * (len(second) + 1) for i in range(len(first) + 1)]
+    for i in range(1, len(first) + 1):
+        dp[i][0] = calc_del_penalty(first[i - 1]) * i
+    for j in range(1, len(second) + 1):
+        dp[0][j] = calc_del_penalty(second[j - 1]) * j
+    for i in range(1, len(first) + 1):
+        for j in range(1, len(second) + 1):
+            dp[i][j] = max(dp[i - 1][j] + calc_del_penalty(first[i - 1]),
+                           dp[i][j - 1] + calc_del_penalty(second[j - 1]),
+                           dp[i - 1][j - 1] + (match_score if first[i - 1] == second[j - 1]
+                                               else calc_edit_penalty(first[i - 1], second[j - 1])))
+    return dp[len(first)][len(second)]
+
+
+class AlignmentScoreTest(unittest.TestCase):
+    def setUp(self):
+        self.random = random.Random(400109384)
+
+    def text(self, alphabet, size):
+        return ''.join(self.random.choice(alphabet) for _ in range(self.random.randint(0, size)))
+
+    def test_unit_penalties(self):
+        for _ in range(2000):
+            first = self.text('abc', 12)
+            second = self.random.choice([first, self.text('abc', 12),
+                                         first[:3] + self.text('abc', 4) + first[5:]])
+            del_penalty = self.random.randint(-3, 0)
+            edit_penalty = self.random.randint(-6, 0)
+            self.assertEqual(
+                evaluator.calc_alignment_score(first, second, del_penalty, edit_penalty),
+                reference_alignment_score(first, second, del_penalty, edit_penalty),
+                (first, second, del_penalty, edit_penalty))
+
+    @unittest.skipIf(evaluator.numpy is None, 'NumPy is not installed')
+    def test_numpy_kernel(self):
+        with mock.patch.object(evaluator, 'NUMPY_BAND', 0):
+            self.test_unit_penalties()
+            lines = [self.text('ab', 3) for _ in range(300)]
+            self.assertEqual(evaluator.calc_alignment_score(lines, lines[::-1], -1, -2),
+                             reference_alignment_score(lines, lines[::-1], -1, -2))
+
+    def test_semantic_errors(self):
+        def errors():
+            lines = []
+            for _ in range(self.random.randint(0, 6)):
+                if self.random.random() < 0.8:
+                    lines.append(f'#{self.random.randint(1, 3)} : {self.text("xy", 4)}')
+                else:
+                    lines.append(self.text('xy#', 3))
+            return '\n'.join(lines)
+
+        def edit_penalty(x, y):
+            return -(x[0] != y[0]) + reference_alignment_score(
+                x[1], y[1], lambda x: -len(x), lambda x, y: -sum(a != b for a, b in zip(x, y)))
+
+        for _ in range(1000):
+            expected, actual = errors(), errors()
+            self.assertEqual(
+                evaluator.calc_semantic_errors_score(expected, actual),
+                reference_alignment_score(self.extract(expected), self.extract(actual),
+                                          evaluator.calc_line_content_del_penalty, edit_penalty),
+                (expected, actual))
+
+    @staticmethod
+    def extract(text):
+        lines = []
+        for line in text.splitlines():
+            if line:
+                m = evaluator.ERROR_PATTERN.match(line)
+                result = m.groupdict() if m else {"linenum": -1, "content": line}
+                lines.append((result["linenum"], (result["content"],)))
+        return lines
+
+    def test_long_output(self):
+        expected = '\n'.join(f'PRINT    {i}' for i in range(3000))
+        actual = expected.replace('PRINT    77\n', '').replace('PRINT    2999', 'PRINT    -1')
+        self.assertEqual(evaluator.calc_program_output_score(expected, expected), 0)
+        self.assertEqual(evaluator.calc_program_output_score(expected, actual), -2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+from io import StringIO
+from tempfile import TemporaryFile
+from utils.scanner import Scanner
+from utils.parser import Parser
+from utils.grammar import Grammar
+from utils.parse_tree import ParseTree, ParseTreeWriter, render_tree
+from utils.error import SyntaxError
+
+
+def parse(text, tree=None):
+    parser = Parser(Scanner(StringIO(text)), True, tree)
+    while not parser.eof_reached():
+        try:
+            parser.proceed()
+        except SyntaxError:
+            pass
+    return parser
+
+
+class ParserStressTest(unittest.TestCase):
+    depth = 20000
+
+    def test_nested_parentheses_and_statements(self):
+        statements = ''.join(f'    x = x + {i};\n' for i in range(self.depth))
+        text = ('void main(void) {\n'
+                '    int x;\n'
+                f'    x = {"(" * self.depth}1{")" * self.depth};\n'
+                f'{statements}'
+                '    output(x);\n'
+                '}\n')
+        try:
+            parser = parse(text)
+        except RecursionError:
+            self.fail('RecursionError raised while parsing')
+        self.assertEqual(parser.get_semantic_errors(), [])
+        self.assertIn('PRINT, @500, , ', map(str, parser.get_pb()))
+
+
+class GrammarTableTest(unittest.TestCase):
+    def test_no_conflicts(self):
+        self.assertEqual(Grammar.conflicts, [])
+
+
+class RenderTreeTest(unittest.TestCase):
+    def test_render_format(self):
+        tree = ParseTree()
+        root = tree.add_node('Program')
+        first = tree.add_node('A', root)
+        tree.add_node('(ID, x)', first)
+        tree.add_node('epsilon', tree.add_node('B', first))
+        tree.add_node('$', root)
+        lines = [f'{pre}{name}' for pre, name in render_tree(tree)]
+        self.assertEqual(lines, [
+            'Program',
+            '├── A',
+            '│   ├── (ID, x)',
+            '│   └── B',
+            '│       └── epsilon',
+            '└── $',
+        ])
+
+    def test_prune(self):
+        tree = ParseTree()
+        root = tree.add_node('Program')
+        first = tree.add_node('A', root)
+        second = tree.add_node('B', root)
+        leaf = tree.add_node('C', tree.add_node('D', second))
+        tree.prune(leaf)
+        self.assertEqual(tree.get_children(root), [first])
+        tree.prune(first)
+        self.assertEqual(tree.get_children(root), [])
+        self.assertEqual(tree.get_parent(first), ParseTree.NONE)
+
+
+class ParseTreeWriterTest(unittest.TestCase):
+    programs = [
+        'void main(void) {\n    int a[10];\n    a[2] = 3 < 4;\n    output(a[2]);\n}\n',
+        'int f(int n) {\n    if (n < 2) return 1; else int return n; endif\n}\nvoid main(void) {}\n',
+        'void main(void) {\n    int x;\n    x = (1 + 2;\n}\n',
+        'void main(void) {\n    int x;\n    if (x == 1) output(x) else x = 2; endif\n}\n',
+        'void main(void) { int x; int',
+    ]
+
+    def test_programs(self):
+        for text in self.programs:
+            tree_lines = list(render_tree(parse(text).get_parse_tree()))
+            with TemporaryFile() as spill:
+                tree_writer = ParseTreeWriter(spill)
+                parse(text, tree_writer)
+                self.assertEqual(list(tree_writer.render()), tree_lines, repr(text))
+
+    def test_prune_written_nodes(self):
+        with TemporaryFile() as spill:
+            for tree in [ParseTree(), ParseTreeWriter(spill)]:
+                root = tree.add_node('Program')
+                first = tree.add_node('A', root)
+                second = tree.add_node('B', root)
+                tree.set_name(tree.add_node('C', first), '(ID, x)')
+                tree.prune(tree.add_node('E', tree.add_node('D', second)))
+                lines = tree.render() if isinstance(tree, ParseTreeWriter) else render_tree(tree)
+                self.assertEqual([f'{pre}{name}' for pre, name in lines], [
+                    'Program',
+                    '└── A',
+                    '    └── (ID, x)',
+                ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import unittest
+from io import StringIO
+from utils.scanner import Scanner
+from utils.parser import Parser
+from utils import peephole
+from utils.instruction import Instruction, Mode
+import vm
+
+
+def compile_program(text, optimize):
+    parser = Parser(Scanner(StringIO(text)), False)
+    while not parser.eof_reached():
+        parser.proceed()
+    return parser.get_pb(optimize)
+
+
+def instruction(text):
+    opcode, *operands = [part.strip() for part in text.split(',')]
+    return Instruction(opcode, *[(operand[0], int(operand[1:])) if operand[0] in '#@'
+                                 else (Mode.DIRECT, int(operand)) for operand in operands if operand])
+
+
+def execute(pb):
+    output = StringIO()
+    with open(os.devnull, 'w') as devnull:
+        vm.run([f'{i}\t({code})\n' for i, code in enumerate(pb)], output, devnull)
+    return output.getvalue()
+
+
+class PeepholeTest(unittest.TestCase):
+    programs = [
+        'int fact(int n) {\n'
+        '    if (n < 2) return 1; else return n * fact(n - 1); endif\n'
+        '}\n'
+        'void main(void) {\n'
+        '    int i;\n'
+        '    for (i = 0; i < 6; i = i + 1) output(fact(i));\n'
+        '}\n',
+        'int g[4];\n'
+        'void fill(int n) { int i; for (i = 0; i < n; i = i + 1) { g[i] = i * i; if (i == 2) break; endif } }\n'
+        'void main(void) {\n'
+        '    int a[3]; int k;\n'
+        '    g[3] = 7; fill(4);\n'
+        '    k = a[1] = g[2] - -g[3];\n'
+        '    if (k < 3) output(k); else { } endif\n'
+        '    output(a[1] + g[0] + g[1]);\n'
+        '}\n',
+    ]
+
+    def test_programs(self):
+        for text in self.programs:
+            pb = compile_program(text, False)
+            optimized = compile_program(text, True)
+            self.assertLess(len(optimized), len(pb))
+            self.assertEqual(execute(optimized), execute(pb))
+
+    def test_remap(self):
+        pb = [
+            'ASSIGN, #6, @500, ',
+            'ADD, 500, #4, 500',
+            'ADD, 500, #4, 500',
+            'SUB, 500, #4, 500',
+            'JP, 5, , ',
+            'JP, 7, , ',
+            'ADD, 500, #4, 500',
+            'SUB, 500, #4, 500',
+            'JPF, @500, 0, ',
+        ]
+        self.assertEqual([str(code) for code in peephole.optimize(map(instruction, pb), [0])], [
+            'ASSIGN, #3, @500, ',
+            'ADD, 500, #4, 500',
+            'JP, 4, , ',
+            'ADD, 500, #4, 500',
+            'SUB, 500, #4, 500',
+            'JPF, @500, 0, ',
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
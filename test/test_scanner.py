@@ -0,0 +1,65 @@
+import random
+import unittest
+from io import StringIO
+from utils.scanner import Scanner
+from utils.regex_scanner import RegexScanner
+from utils.error import LexicalError
+
+
+def tokenize(scanner_class, text):
+    scanner = scanner_class(StringIO(text))
+    tokens = []
+    is_eof = False
+    while not is_eof:
+        try:
+            token_type, token_str, is_eof = scanner.get_next_token()
+            tokens.append((token_type, token_str, is_eof, scanner.get_lineno()))
+        except LexicalError as le:
+            tokens.append((type(le), str(le), scanner.get_lineno()))
+    return tokens, scanner.get_lexemes()
+
+
+class ScannerBackendTest(unittest.TestCase):
+    programs = [
+        '',
+        'int x;\n  \n\n',
+        'void main(void) {\n    int a[10];\n    a[2] = 3 == 4 < 5;\n}\n',
+        'x = 12ab + 3;\ny = a1 @ 2;',
+        'a = 1 /* open\n\nx',
+        '/* a ** comment **/ b /*/ nested? */ c*/d',
+        '*/ 3 / 4 == = ==== x',
+        'é x 12a\n*/ 3 / 4 == =',
+        'if else void int for break return endif ifx endif1',
+        'a\\b>c:d , e',
+        'x*',
+        'x ==',
+        '123',
+        '/',
+        '* \n/* \x01 */ =\x02 abc\x03 5\x04 \n\x05',
+    ]
+
+    def assertSameTokens(self, text):
+        self.assertEqual(tokenize(Scanner, text), tokenize(RegexScanner, text), repr(text))
+
+    def test_programs(self):
+        for text in self.programs:
+            self.assertSameTokens(text)
+
+    def test_random_inputs(self):
+        alphabet = 'aZ09 \n\t/*=<;{}[]()+-,:\\@#.é\x01'
+        rng = random.Random(400109384)
+        for _ in range(3000):
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+            self.assertSameTokens(text)
+
+    def test_chunk_boundaries(self):
+        text = ''.join(self.programs)
+        expected = tokenize(Scanner, text)
+        for chunk_size in [1, 2, 3, 5, 8]:
+            for base_class in [Scanner, RegexScanner]:
+                scanner_class = type('ChunkedScanner', (base_class,), {'CHUNK_SIZE': chunk_size})
+                self.assertEqual(tokenize(scanner_class, text), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
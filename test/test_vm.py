@@ -0,0 +1,200 @@
+import unittest
+from io import StringIO
+from utils.scanner import Scanner
+from utils.parser import Parser
+import vm
+import threaded_vm
+
+
+def execute(instructions):
+    output = StringIO()
+    trace = StringIO()
+    vm.run(instructions, output, trace)
+    return output.getvalue(), trace.getvalue()
+
+
+class VMTest(unittest.TestCase):
+    instructions = [
+        '0\t(ASSIGN, #4, 100, )\n',
+        '1\t(ASSIGN, #100, 104, )\n',
+        '\n',
+        '2\t(SUB, @104, #1, 100)\n',
+        '3\t(PRINT, 100, , )\n',
+        '4\t(LT, #0, 100, 108)\n',
+        '5\t(JPF, 108, 7, )\n',
+        '6\t(JP, 2, , )\n',
+        '7\t(NOT, 108, 112, )\n',
+        '8\t(PRINT, 112, , )\n',
+    ]
+
+    def test_decode(self):
+        self.assertEqual(vm.decode_instruction('2\t(SUB, @104, #1, 100)\n')[:3],
+                         (vm.Opcode.SUB, vm.TRIPLE_ADDRESS_OPERATIONS[vm.Opcode.SUB],
+                          ((vm.Mode.INDIRECT, 104), (vm.Mode.IMMEDIATE, 1), (vm.Mode.DIRECT, 100))))
+        self.assertEqual(vm.decode_instruction('0\t(JP, 3, , )')[2], ((vm.Mode.DIRECT, 3),))
+
+    def test_run(self):
+        output, trace = execute(self.instructions)
+        self.assertEqual(output.split('\n'), ['PRINT    3', 'PRINT    2', 'PRINT    1',
+                                              'PRINT    0', 'PRINT    True', ''])
+        self.assertTrue(trace.startswith('--->  PC = 0 command : 0\t(ASSIGN, #4, 100, )\n'
+                                         '--->  memory[100] = 4\n'))
+
+    def test_fast(self):
+        output = StringIO()
+        trace = StringIO()
+        vm.run(self.instructions, output, trace, fast=True)
+        self.assertEqual(output.getvalue(), execute(self.instructions)[0])
+        self.assertEqual(trace.getvalue(), '')
+
+    def test_trace_last(self):
+        instructions = self.instructions + ['9\t(PRINT, 116, , )\n']
+        trace = StringIO()
+        with self.assertRaises(Exception):
+            vm.run(instructions, StringIO(), trace, fast=True, trace_size=3)
+        self.assertEqual(trace.getvalue(), '--->  PC = 7 command : 7\t(NOT, 108, 112, )\n'
+                                           '--->  PC = 8 command : 8\t(PRINT, 112, , )\n'
+                                           '--->  PC = 9 command : 9\t(PRINT, 116, , )\n')
+
+    def test_word_memory(self):
+        instructions = self.instructions + [
+            '9\t(ASSIGN, #4611686018427387904, 120, )\n',
+            '10\t(MULT, 120, #4, 40000)\n',
+            '11\t(PRINT, 40000, , )\n',
+            '12\t(ASSIGN, 112, 6, )\n',
+            '13\t(PRINT, 6, , )\n',
+        ]
+        output = StringIO()
+        trace = StringIO()
+        vm.run(instructions, output, trace, word_memory=True)
+        self.assertEqual((output.getvalue(), trace.getvalue()), execute(instructions))
+        self.assertTrue(output.getvalue().endswith('PRINT    True\nPRINT    18446744073709551616\n'
+                                                   'PRINT    True\n'))
+
+    def test_word_memory_invalid_access(self):
+        memory = vm.WordMemory(4)
+        memory.write(4, 1)
+        memory.write(400, 2)
+        self.assertEqual(dict(memory.items()), {4: 1, 400: 2})
+        self.assertIn(400, memory)
+        self.assertNotIn(8, memory)
+        for address in (0, 8, 5, -4, 4000):
+            with self.assertRaises(Exception) as context:
+                memory.read(address)
+            self.assertEqual(context.exception.args, ('Invalid access to memory', address))
+
+    def test_superinstructions(self):
+        instructions = [
+            '0\t(ASSIGN, #512, 500, )\n',
+            '1\t(ASSIGN, #0, 600, )\n',
+            '2\t(ASSIGN, #9, @500, )\n',
+            '3\t(ADD, 500, #4, 500)\n',
+            '4\t(JPF, 600, 7, )\n',
+            '5\t(PRINT, 500, , )\n',
+            '6\t(JP, 9, , )\n',
+            '7\t(ASSIGN, #1, 600, )\n',
+            '8\t(JP, 3, , )\n',
+            '9\t(SUB, 500, #4, 500)\n',
+            '10\t(SUB, 500, #4, 500)\n',
+            '11\t(PRINT, @500, , )\n',
+        ]
+        program = vm.decode(instructions, True)
+        self.assertEqual([decoded[0] for decoded in program[2:4]], [vm.Opcode.PUSH, vm.Opcode.ADD])
+        self.assertEqual(program[9][:3], (vm.Opcode.POP, None, 500))
+        for fast in (False, True):
+            output = StringIO()
+            vm.run(instructions, output, StringIO(), fast)
+            self.assertEqual(output.getvalue(), 'PRINT    520\nPRINT    9\n')
+
+    def test_return_superinstruction(self):
+        parser = Parser(Scanner(StringIO(ThreadedVMTest.program)), False)
+        while not parser.eof_reached():
+            parser.proceed()
+        instructions = [f'{i}\t({code})\n' for i, code in enumerate(parser.get_pb())]
+        self.assertIn(vm.Opcode.RET, [decoded[0] for decoded in vm.decode(instructions, True)])
+        output = StringIO()
+        vm.run(instructions, output, StringIO(), fast=True)
+        self.assertEqual(output.getvalue(), execute(instructions)[0])
+
+    def test_structured(self):
+        parser = Parser(Scanner(StringIO(ThreadedVMTest.program)), False)
+        while not parser.eof_reached():
+            parser.proceed()
+        pb = parser.get_pb()
+        self.assertEqual(execute(pb), execute([f'{i}\t({code})\n' for i, code in enumerate(pb)]))
+        output = StringIO()
+        vm.run(pb, output, StringIO(), fast=True)
+        threaded_vm.run(pb, output, StringIO())
+        self.assertEqual(output.getvalue(), execute(pb)[0] * 2)
+
+    def test_invalid_command_raises_when_executed(self):
+        instructions = ['0\t(JP, 2, , )\n', '1\t(FOO, 1, 2, )\n', '2\t(PRINT, #7, , )\n']
+        self.assertEqual(execute(instructions)[0], 'PRINT    7\n')
+        instructions[0] = '0\t(JP, 1, , )\n'
+        with self.assertRaises(Exception) as context:
+            execute(instructions)
+        self.assertEqual(context.exception.args, ('Invalid Command', 'FOO'))
+
+    def test_max_steps(self):
+        output = StringIO()
+        vm.run(self.instructions, output, StringIO(), max_steps=30)
+        self.assertEqual(output.getvalue(), execute(self.instructions)[0])
+        for fast in (False, True):
+            with self.assertRaises(TimeoutError) as context:
+                vm.run(['0\t(JP, 0, , )\n'], StringIO(), StringIO(), fast, max_steps=1000)
+            self.assertEqual(context.exception.args, ('Step budget exceeded', 1000))
+
+    def test_invalid_access(self):
+        with self.assertRaises(Exception) as context:
+            execute(['0\t(ADD, 100, #1, 100)\n'])
+        self.assertEqual(context.exception.args, ('Invalid access to memory', 100))
+
+
+class ThreadedVMTest(unittest.TestCase):
+    program = (
+        'int g[4];\n'
+        'int fact(int n) { if (n < 2) return 1; endif return n * fact(n - 1); }\n'
+        'void main(void) {\n'
+        '    int i;\n'
+        '    for (i = 0; i < 4; i = i + 1) { g[i] = fact(i + 1); if (i == 2) break; endif }\n'
+        '    output(g[0] + g[1] * g[2]);\n'
+        '    output(fact(20) * fact(20));\n'
+        '}\n')
+
+    def run_both(self, instructions):
+        outputs = []
+        for run in (vm.run, threaded_vm.run):
+            output = StringIO()
+            try:
+                run(instructions, output, StringIO())
+            except Exception as e:
+                output.write(repr(e.args))
+            outputs.append(output.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+        return outputs[1]
+
+    def test_program(self):
+        parser = Parser(Scanner(StringIO(self.program)), False)
+        while not parser.eof_reached():
+            parser.proceed()
+        pb = parser.get_pb()
+        output = self.run_both([f'{i}\t({code})\n' for i, code in enumerate(pb)])
+        self.assertEqual(output, f'PRINT    13\nPRINT    {(2432902008176640000 ** 2)}\n')
+
+    def test_jumps(self):
+        instructions = VMTest.instructions + [
+            '9\t(ASSIGN, #12, 200, )\n',
+            '10\t(JPF, 112, 12, )\n',
+            '11\t(JP, @200, , )\n',
+            '12\t(ASSIGN, #-2, 200, )\n',
+            '13\t(JP, @200, , )\n',
+            '14\t(FOO, 1, , )\n',
+            '15\t(PRINT, 4, , )\n',
+        ]
+        self.assertTrue(self.run_both(instructions).endswith("('Invalid Command', 'FOO')"))
+        instructions[-2] = '14\t(PRINT, #1, , )\n'
+        self.assertTrue(self.run_both(instructions).endswith("('Invalid access to memory', 4)"))
+
+
+if __name__ == '__main__':
+    unittest.main()
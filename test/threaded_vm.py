@@ -0,0 +1,150 @@
+import sys
+import vm
+from vm import Opcode, Mode
+
+# Compiles the decoded program into one Python function per basic block,
+# with every operand written into the function as a constant. A block
+# returns the pc to continue at, so the run loop is pc = block(). Blocks
+# start at pc 0, at static jump targets and after jumps, which covers the
+# return addresses pushed before a call, a jump anywhere else compiles a
+# block starting there the first time it is taken. Like vm.run in fast
+# mode no trace is written.
+
+OPERATORS = {
+    Opcode.ADD: '{} + {}',
+    Opcode.AND: '{} & {}',
+    Opcode.EQ: 'int({} == {})',
+    Opcode.LT: 'int({} < {})',
+    Opcode.MULT: '{} * {}',
+    Opcode.DIV: '{} // {}',
+    Opcode.SUB: '{} - {}',
+}
+
+
+def source_operand(operand):
+    mode, value = operand
+    if mode is Mode.IMMEDIATE:
+        return repr(value)
+    elif mode is Mode.INDIRECT:
+        return f'm[m[{value}]]'
+    else:
+        return f'm[{value}]'
+
+
+def dest_operand(operand):
+    mode, value = operand
+    if mode is Mode.INDIRECT:
+        return f'm[{value}]'
+    else:
+        return repr(value)
+
+
+class ThreadedProgram:
+    def __init__(self, program, context):
+        self.program = program
+        self.context = context
+        self.errors = []
+        self.namespace = {'m': context.memory, 'out': context.output_file, 'errors': self.errors}
+        self.blocks = [None] * len(program)
+        self.negative_blocks = {}
+        self.leaders = {0}
+        for pc, (opcode, _, params, _) in enumerate(program):
+            if opcode in (Opcode.JP, Opcode.JPF, Opcode.INVALID):
+                self.leaders.add(pc + 1)
+                if opcode is not Opcode.INVALID:
+                    mode, target = params[-1]
+                    if mode is not Mode.INDIRECT:
+                        self.leaders.add(target)
+        self._compile(sorted(pc for pc in self.leaders if 0 <= pc < len(program)))
+
+    @staticmethod
+    def _name(start):
+        return f'block_{start}' if start >= 0 else f'block_minus_{-start}'
+
+    def _block_source(self, start):
+        lines = [f'def {self._name(start)}():']
+        pc = start
+        while True:
+            if pc >= len(self.program) or (pc != start and pc in self.leaders):
+                lines.append(f'    return {pc}')
+                break
+            opcode, _, params, _ = self.program[pc]
+            pc += 1
+            if opcode in OPERATORS:
+                value = OPERATORS[opcode].format(source_operand(params[0]),
+                                                 source_operand(params[1]))
+                lines.append(f'    m[{dest_operand(params[2])}] = {value}')
+            elif opcode is Opcode.ASSIGN:
+                # Only because of consistency with the legacy tester
+                lines.append(f'    d = {dest_operand(params[1])}')
+                lines.append('    if d not in m:')
+                lines.append('        m[d] = 0')
+                lines.append(f'    m[d] = {source_operand(params[0])}')
+            elif opcode is Opcode.NOT:
+                lines.append(f'    m[{dest_operand(params[1])}] = not {source_operand(params[0])}')
+            elif opcode is Opcode.PRINT:
+                lines.append(f"    print('PRINT', {source_operand(params[0])}, sep='    ', file=out)")
+            elif opcode is Opcode.JP:
+                lines.append(f'    return {dest_operand(params[0])}')
+                break
+            elif opcode is Opcode.JPF:
+                lines.append(f'    if not {source_operand(params[0])}:')
+                lines.append(f'        return {dest_operand(params[1])}')
+                lines.append(f'    return {pc}')
+                break
+            else:
+                lines.append(f'    raise errors[{len(self.errors)}]')
+                self.errors.append(params)
+                break
+            # Negative pcs index the program from its end as in vm.execute
+            if start < 0:
+                lines.append(f'    return {pc}')
+                break
+        return '\n'.join(lines)
+
+    def _compile(self, starts):
+        source = '\n'.join(self._block_source(start) for start in starts)
+        exec(compile(source, '<threaded>', 'exec'), self.namespace)
+        for start in starts:
+            block = self.namespace[self._name(start)]
+            if start >= 0:
+                self.blocks[start] = block
+            else:
+                self.negative_blocks[start] = block
+        return block
+
+    def block(self, pc):
+        if pc < 0:
+            block = self.negative_blocks.get(pc)
+        else:
+            block = self.blocks[pc]
+        return block if block is not None else self._compile([pc])
+
+    def execute(self):
+        blocks = self.blocks
+        size = len(blocks)
+        pc = self.context.pc
+        try:
+            while pc < size:
+                block = blocks[pc] if pc >= 0 else None
+                if block is None:
+                    block = self.block(pc)
+                pc = block()
+        except KeyError as error:
+            raise Exception('Invalid access to memory', error.args[0]) from None
+        finally:
+            self.context.pc = pc
+
+
+def run(instructions: list[str], output_file, error_file):
+    context = vm.Context(output_file, error_file, fast=True)
+    program = vm.decode(inst for inst in instructions
+                        if not isinstance(inst, str) or not inst.isspace())
+    try:
+        ThreadedProgram(program, context).execute()
+    except:
+        print(context.memory, file=sys.stderr)
+        raise
+
+if __name__ == "__main__":
+    run(sys.stdin.readlines(), sys.stdout, sys.stderr)
@@ -1,132 +1,401 @@
 import sys
 import re
+import argparse
+import operator
+from array import array
+from collections import deque
+from enum import Enum
 
 COMMAND_PATTERN = re.compile(
     r'\d+\s+\(\s*(?P<command>[A-Z]+)(?P<params>(\s*,\s*[#@]?[-+]?\d*)+)\s*\)')
 
 
+class Opcode(Enum):
+    ADD = 'ADD'
+    AND = 'AND'
+    ASSIGN = 'ASSIGN'
+    EQ = 'EQ'
+    JPF = 'JPF'
+    JP = 'JP'
+    LT = 'LT'
+    MULT = 'MULT'
+    DIV = 'DIV'
+    NOT = 'NOT'
+    PRINT = 'PRINT'
+    SUB = 'SUB'
+    # Lines that failed to decode, they raise their error once executed
+    INVALID = 'INVALID'
+    # Superinstructions for the sequences CodeGenerator emits, see fuse
+    PUSH = 'PUSH'
+    POP = 'POP'
+    RET = 'RET'
+
+
+class Mode(Enum):
+    IMMEDIATE = '#'
+    DIRECT = ''
+    INDIRECT = '@'
+
+
+COMMANDS = {opcode.value for opcode in Opcode} - {'INVALID', 'PUSH', 'POP', 'RET'}
+
+TRIPLE_ADDRESS_OPERATIONS = {
+    Opcode.ADD: operator.add,
+    Opcode.AND: operator.and_,
+    Opcode.EQ: lambda x0, x1: int(x0 == x1),
+    Opcode.LT: lambda x0, x1: int(x0 < x1),
+    Opcode.MULT: operator.mul,
+    Opcode.DIV: operator.floordiv,
+    Opcode.SUB: operator.sub,
+}
+
+
+class WordMemory:
+    # Word-addressed memory, address 4 * i is words[i] and valid[i] tells if
+    # it was written. Booleans and integers a machine word cannot hold are
+    # kept in boxed, addresses that are not a multiple of 4 or are negative
+    # in unaligned. Starts with room for the globals and the bottom of the
+    # stack and doubles when a write goes past the end.
+    INITIAL_WORDS = 1024
+
+    WORD = 1
+    BOXED = 2
+    WORD_MIN = -2 ** 63
+    WORD_MAX = 2 ** 63 - 1
+
+    def __init__(self, size=INITIAL_WORDS):
+        self.words = array('q', bytes(8 * size))
+        self.valid = bytearray(size)
+        self.boxed = {}
+        self.unaligned = {}
+
+    def _grow(self, index):
+        size = len(self.valid)
+        while size <= index:
+            size *= 2
+        self.words.frombytes(bytes(8 * (size - len(self.valid))))
+        self.valid.extend(bytes(size - len(self.valid)))
+
+    def read(self, address: int):
+        index = address >> 2
+        if not address & 3 and index >= 0:
+            state = self.valid[index] if index < len(self.valid) else 0
+            if state == self.WORD:
+                return self.words[index]
+            elif state == self.BOXED:
+                return self.boxed[index]
+        elif address in self.unaligned:
+            return self.unaligned[address]
+        raise Exception('Invalid access to memory', address)
+
+    def write(self, address: int, value):
+        index = address >> 2
+        if address & 3 or index < 0:
+            self.unaligned[address] = value
+            return
+        if index >= len(self.valid):
+            self._grow(index)
+        if type(value) is int and self.WORD_MIN <= value <= self.WORD_MAX:
+            self.words[index] = value
+            self.valid[index] = self.WORD
+        else:
+            self.boxed[index] = value
+            self.valid[index] = self.BOXED
+
+    def __contains__(self, address: int):
+        index = address >> 2
+        if address & 3 or index < 0:
+            return address in self.unaligned
+        return index < len(self.valid) and self.valid[index] != 0
+
+    def items(self):
+        for index, state in enumerate(self.valid):
+            if state == self.WORD:
+                yield 4 * index, self.words[index]
+            elif state == self.BOXED:
+                yield 4 * index, self.boxed[index]
+        yield from self.unaligned.items()
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
 class Context:
-    def __init__(self, output_file, error_file):
-        self.memory = dict()
+    # With fast set nothing is written to error_file while running, with
+    # trace_size the last trace_size executed instructions are kept in
+    # recent instead and written out if the program fails. With max_steps
+    # the program stops with a TimeoutError after that many instructions.
+    def __init__(self, output_file, error_file, fast=False, trace_size=0, word_memory=False,
+                 max_steps=None):
+        self.memory = WordMemory() if word_memory else dict()
         self.pc = 0
         self.output_file = output_file
         self.error_file = error_file
+        self.fast = fast
+        self.recent = deque(maxlen=trace_size) if fast and trace_size else None
+        self.max_steps = max_steps
 
 
-def run(instructions: list[str], output_file, error_file):
-    context = Context(output_file, error_file)
-    instructions = [inst for inst in instructions if not inst.isspace()]
-    while context.pc < len(instructions):
-        try:
-            instruction = instructions[context.pc]
-            __execute(instruction, context)
-        except:
-            print(context.memory, file=sys.stderr)
-            raise
-
-
-def __execute(instruction: str, context: Context):
-    print('--->  PC =', context.pc,
-          'command :', instruction,
-          end='',
-          file=context.error_file)
+def decode_operand(param: str):
+    value = int(param) if param[0].isdigit() else int(param[1:])
+    if param.startswith('#'):
+        return Mode.IMMEDIATE, value
+    elif param.startswith('@'):
+        return Mode.INDIRECT, value
+    else:
+        return Mode.DIRECT, value
+
+
+# Returns (opcode, operation, operands, instruction) where operands are
+# (Mode, int) pairs and operation is the function of a triple address command
+def decode_instruction(instruction: str):
+    try:
+        match = re.match(COMMAND_PATTERN, instruction)
+        if not match:
+            raise Exception('Invalid Command', instruction)
+
+        command = match['command'].upper()
+        if command not in COMMANDS:
+            raise Exception('Invalid Command', command)
+        params = [s.strip() for s in match['params'].split(',')[1:]]
+        # Only for consistency with legacy tester
+        params = [p for p in params if p and not p.isspace()]
+        opcode = Opcode[command]
+        operands = tuple(decode_operand(param) for param in params)
+        return opcode, TRIPLE_ADDRESS_OPERATIONS.get(opcode), operands, instruction
+    except Exception as error:
+        return Opcode.INVALID, None, error, instruction
+
+
+# Decodes an instruction object of the compiler, the opcode name and
+# (mode prefix, int) operands are taken as they are and only the trace text
+# is formatted. pc is its line in the program
+def decode_structured(pc, instruction):
+    text = f'{pc}\t({instruction})\n'
+    if instruction.opcode not in COMMANDS:
+        error = Exception('Invalid Command', instruction.opcode or text)
+        return Opcode.INVALID, None, error, text
+    opcode = Opcode[instruction.opcode]
+    operands = tuple((Mode(mode), value) for mode, value in instruction.operands)
+    return opcode, TRIPLE_ADDRESS_OPERATIONS.get(opcode), operands, text
+
+
+# instructions are lines of text or the compiler's instruction objects
+def decode(instructions, superinstructions=False):
+    program = [decode_instruction(instruction) if isinstance(instruction, str)
+               else decode_structured(pc, instruction)
+               for pc, instruction in enumerate(instructions)]
+    return fuse(program) if superinstructions else program
+
+
+def _is_step(decoded, opcode, address=None):
+    # opcode, a, #4, a
+    op, _, params, _ = decoded
+    return op is opcode and len(params) == 3 and params[0][0] is Mode.DIRECT \
+        and (address is None or params[0][1] == address) \
+        and params[1] == (Mode.IMMEDIATE, 4) and params[2] == params[0]
+
+
+def _is_assign(decoded, source_mode, dest_mode):
+    op, _, params, _ = decoded
+    return op is Opcode.ASSIGN and len(params) == 2 \
+        and params[0][0] is source_mode and params[1][0] is dest_mode
+
+
+def _fuse_at(program, pc):
+    # RET: SUB f, #4, s  ASSIGN @s, f  SUB s, #4, s  ASSIGN @s, t  JP @t
+    ret = program[pc:pc + 5]
+    if len(ret) == 5 and ret[0][0] is Opcode.SUB and len(ret[0][2]) == 3:
+        f, four, s = ret[0][2]
+        if f[0] is Mode.DIRECT and four == (Mode.IMMEDIATE, 4) and s[0] is Mode.DIRECT \
+                and _is_assign(ret[1], Mode.INDIRECT, Mode.DIRECT) \
+                and ret[1][2] == ((Mode.INDIRECT, s[1]), f) \
+                and _is_step(ret[2], Opcode.SUB, s[1]) \
+                and _is_assign(ret[3], Mode.INDIRECT, Mode.DIRECT) \
+                and ret[3][2][0] == (Mode.INDIRECT, s[1]) \
+                and ret[4][0] is Opcode.JP and ret[4][2][:1] == ((Mode.INDIRECT, ret[3][2][1][1]),):
+            return Opcode.RET, None, (f[1], s[1], ret[3][2][1][1]), \
+                ''.join(decoded[3] for decoded in ret)
+    # PUSH: ASSIGN v, @a  ADD a, #4, a
+    push = program[pc:pc + 2]
+    if len(push) == 2 and push[0][0] is Opcode.ASSIGN and len(push[0][2]) == 2 \
+            and push[0][2][1][0] is Mode.INDIRECT \
+            and _is_step(push[1], Opcode.ADD, push[0][2][1][1]):
+        return Opcode.PUSH, None, (push[0][2][0], push[0][2][1][1]), \
+            push[0][3] + push[1][3]
+    # POP: SUB a, #4, a
+    if _is_step(program[pc], Opcode.SUB):
+        return Opcode.POP, None, program[pc][2][0][1], program[pc][3]
+    return program[pc]
+
+
+# Replaces the push, pop and return sequences of CodeGenerator by single
+# superinstructions. Only the first slot of a sequence is replaced, the
+# others keep their own instruction, so a jump into the middle of a
+# sequence runs the rest of it as before. Used for fast runs only, a
+# superinstruction is traced as one instruction.
+def fuse(program):
+    return [_fuse_at(program, pc) for pc in range(len(program))]
+
+
+def run(instructions: list[str], output_file, error_file, fast=False, trace_size=0,
+        word_memory=False, max_steps=None):
+    context = Context(output_file, error_file, fast, trace_size, word_memory, max_steps)
+    program = decode((inst for inst in instructions
+                      if not isinstance(inst, str) or not inst.isspace()), fast)
+    try:
+        execute(program, context)
+    except:
+        if context.recent is not None:
+            for pc, instruction in context.recent:
+                print('--->  PC =', pc,
+                      'command :', instruction,
+                      end='',
+                      file=context.error_file)
+        print(context.memory, file=sys.stderr)
+        raise
+
+
+def execute(program: list, context: Context):
+    memory = context.memory
+    error_file = context.error_file
+    trace = not context.fast
+    recent = context.recent
+    IMMEDIATE, DIRECT, INDIRECT = Mode.IMMEDIATE, Mode.DIRECT, Mode.INDIRECT
+    PUSH, POP, RET = Opcode.PUSH, Opcode.POP, Opcode.RET
+
+    if isinstance(memory, WordMemory):
+        # The common case of an aligned word inside memory is inlined, the
+        # arrays are extended in place so they stay valid after growing
+        words, valid, WORD = memory.words, memory.valid, WordMemory.WORD
+        WORD_MIN, WORD_MAX = WordMemory.WORD_MIN, WordMemory.WORD_MAX
+
+        def read_memory(address: int):
+            index = address >> 2
+            if not address & 3 and 0 <= index < len(valid) and valid[index] == WORD:
+                return words[index]
+            return memory.read(address)
+
+        def write_memory(address: int, value):
+            index = address >> 2
+            if not address & 3 and 0 <= index < len(valid) and type(value) is int \
+                    and WORD_MIN <= value <= WORD_MAX:
+                words[index] = value
+                valid[index] = WORD
+            else:
+                memory.write(address, value)
+    else:
+        def read_memory(address: int):
+            value = memory.get(address, None)
+            if value is None:
+                raise Exception('Invalid access to memory', address)
 
-    def resolve(param: str):
-        if param.casefold() == 'true':
-            return 1
-        elif param.casefold() == 'false':
-            return 0
+            return value
 
-        value = int(param) if param[0].isdigit() else int(param[1:])
+        def write_memory(address: int, value):
+            memory[address] = value
 
-        if param.startswith('#'):
+    def resolve(operand):
+        mode, value = operand
+        if mode is IMMEDIATE:
             return value
-        elif param.startswith('@'):
+        elif mode is INDIRECT:
             return read_memory(read_memory(value))
         else:
             return read_memory(value)
 
-    def resolve_dest(param: str):
-        value = int(param) if param[0].isdigit() else int(param[1:])
-
-        if param.startswith('#'):
-            return value
-        elif param.startswith('@'):
+    def resolve_dest(operand):
+        mode, value = operand
+        if mode is INDIRECT:
             return read_memory(value)
         else:
             return value
 
-    def read_memory(address: int):
-        value = memory.get(address, None)
-        if value is None:
-            raise Exception('Invalid access to memory', address)
-
-        return value
-
-    def set_memory(param: str, value: int):
-        address = resolve_dest(param)
-        memory[address] = value
-        print(f'--->  memory[{address}] =', value, file=context.error_file)
-
-    memory = context.memory
-    context.pc += 1
-
-    match = re.match(COMMAND_PATTERN, instruction)
-    if not match:
-        raise Exception('Invalid Command', instruction)
-
-    command = match['command'].upper()
-    params = [s.strip() for s in match['params'].split(',')[1:]]
-    # Only for consistency with legacy tester
-    params = [p for p in params if p and not p.isspace()]
-
-    def run_triple_address(operation):
-        set_memory(params[2],
-                   operation(resolve(params[0]), resolve(params[1])))
-
-    if command == 'ADD':
-        run_triple_address(lambda x0, x1: x0 + x1)
-
-    elif command == 'AND':
-        run_triple_address(lambda x0, x1: x0 & x1)
-
-    elif command == 'ASSIGN':
-        # Only because of consistency with the legacy tester
-        if resolve_dest(params[1]) not in memory:
-            memory[resolve_dest(params[1])] = 0
-        set_memory(params[1], resolve(params[0]))
-
-    elif command == 'EQ':
-        run_triple_address(lambda x0, x1: int(x0 == x1))
-
-    elif command == 'JPF':
-        if not resolve(params[0]):
-            context.pc = resolve_dest(params[1])
-
-    elif command == 'JP':
-        context.pc = resolve_dest(params[0])
-
-    elif command == 'LT':
-        run_triple_address(lambda x0, x1: int(x0 < x1))
-
-    elif command == 'MULT':
-        run_triple_address(lambda x0, x1: x0 * x1)
-
-    elif command == 'DIV':
-        run_triple_address(lambda x0, x1: x0 // x1)
-
-    elif command == 'NOT':
-        set_memory(params[1], not resolve(params[0]))
-
-    elif command == 'PRINT':
-        print('PRINT', resolve(params[0]),
-              sep='    ', file=context.output_file)
-
-    elif command == 'SUB':
-        run_triple_address(lambda x0, x1: x0 - x1)
-
-    else:
-        raise Exception('Invalid Command', command)
+    def set_memory(operand, value: int):
+        address = resolve_dest(operand)
+        write_memory(address, value)
+        if trace:
+            print(f'--->  memory[{address}] =', value, file=error_file)
+
+    # Counts down to 0, starting below 0 it never gets there
+    steps_left = -1 if context.max_steps is None else context.max_steps
+    pc = context.pc
+    try:
+        while pc < len(program):
+            if not steps_left:
+                raise TimeoutError('Step budget exceeded', context.max_steps)
+            steps_left -= 1
+            opcode, operation, params, instruction = program[pc]
+            if trace:
+                print('--->  PC =', pc,
+                      'command :', instruction,
+                      end='',
+                      file=error_file)
+            elif recent is not None:
+                recent.append((pc, instruction))
+            pc += 1
+
+            if operation is not None:
+                set_memory(params[2],
+                           operation(resolve(params[0]), resolve(params[1])))
+
+            elif opcode is PUSH:
+                value, address = params
+                stack = read_memory(address)
+                if stack not in memory:
+                    write_memory(stack, 0)
+                set_memory((INDIRECT, address), resolve(value))
+                set_memory((DIRECT, address), read_memory(address) + 4)
+                pc += 1
+
+            elif opcode is POP:
+                set_memory((DIRECT, params), read_memory(params) - 4)
+
+            elif opcode is Opcode.ASSIGN:
+                # Only because of consistency with the legacy tester
+                if resolve_dest(params[1]) not in memory:
+                    write_memory(resolve_dest(params[1]), 0)
+                set_memory(params[1], resolve(params[0]))
+
+            elif opcode is Opcode.JPF:
+                if not resolve(params[0]):
+                    pc = resolve_dest(params[1])
+
+            elif opcode is Opcode.JP:
+                pc = resolve_dest(params[0])
+
+            elif opcode is Opcode.NOT:
+                set_memory(params[1], not resolve(params[0]))
+
+            elif opcode is RET:
+                fp, sp, temp = params
+                set_memory((DIRECT, sp), read_memory(fp) - 4)
+                set_memory((DIRECT, fp), read_memory(read_memory(sp)))
+                set_memory((DIRECT, sp), read_memory(sp) - 4)
+                if temp not in memory:
+                    write_memory(temp, 0)
+                set_memory((DIRECT, temp), read_memory(read_memory(sp)))
+                pc = read_memory(temp)
+
+            elif opcode is Opcode.PRINT:
+                print('PRINT', resolve(params[0]),
+                      sep='    ', file=context.output_file)
+
+            else:
+                raise params
+    finally:
+        context.pc = pc
 
 if __name__ == "__main__":
-    run(sys.stdin.readlines(), sys.stdout, sys.stderr)
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--fast', action='store_true',
+                            help='do not write the execution trace to stderr')
+    arg_parser.add_argument('--trace-last', dest='trace_size', type=int, default=0, metavar='N',
+                            help='with --fast, write the last N executed instructions if the program fails')
+    arg_parser.add_argument('--word-memory', action='store_true',
+                            help='keep memory in a word array instead of a dict')
+    arg_parser.add_argument('--max-steps', type=int, default=None, metavar='N',
+                            help='stop with an error after N executed instructions')
+    args = arg_parser.parse_args()
+    run(sys.stdin.readlines(), sys.stdout, sys.stderr, args.fast, args.trace_size,
+        args.word_memory, args.max_steps)
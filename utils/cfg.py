@@ -0,0 +1,119 @@
+from utils.instruction import Mode, immediate, direct
+from utils.peephole import JUMP_TARGETS
+
+class BasicBlock:
+    __slots__ = ('start', 'end', 'successors', 'returns', 'return_sites')
+
+    # Instructions start to end - 1 of PB. successors are the indexes of the
+    # blocks reached by direct jumps and by falling through, returns tells
+    # if the block ends with an indirect jump and return_sites are the
+    # blocks of the return addresses pushed in the block
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.successors = []
+        self.returns = False
+        self.return_sites = []
+
+def _target(instruction):
+    if instruction.opcode not in JUMP_TARGETS:
+        return None
+    return instruction.operands[JUMP_TARGETS[instruction.opcode]]
+
+# Blocks start at 0, at jump targets, at return addresses and after every
+# jump or line left unfilled, which stops the VM with an invalid command
+def build_blocks(pb, address_lines=()):
+    leaders = {0, len(pb)}
+    for lineno, instruction in enumerate(pb):
+        target = _target(instruction)
+        if target is not None or instruction.opcode is None:
+            leaders.add(lineno + 1)
+        if target is not None and target[0] == Mode.DIRECT:
+            leaders.add(min(target[1], len(pb)))
+    for lineno in address_lines:
+        leaders.add(min(pb[lineno].operands[0][1], len(pb)))
+    starts = sorted(leaders)
+    return [BasicBlock(start, end) for start, end in zip(starts, starts[1:])]
+
+# Links the blocks, a jump to the end of the program has no successor
+def build_cfg(pb, address_lines=()):
+    blocks = build_blocks(pb, address_lines)
+    block_of = [0] * (len(pb) + 1)
+    for index, block in enumerate(blocks):
+        block_of[block.start:block.end] = [index] * (block.end - block.start)
+    block_of[len(pb)] = None
+
+    for lineno in address_lines:
+        site = block_of[min(pb[lineno].operands[0][1], len(pb))]
+        if site is not None:
+            blocks[block_of[lineno]].return_sites.append(site)
+    for block in blocks:
+        last = pb[block.end - 1]
+        target = _target(last)
+        if target is None:
+            successors = [] if last.opcode is None else [block_of[block.end]]
+        elif target[0] != Mode.DIRECT:
+            block.returns = True
+            successors = []
+        elif last.opcode == 'JPF':
+            successors = [block_of[min(target[1], len(pb))], block_of[block.end]]
+        else:
+            successors = [block_of[min(target[1], len(pb))]]
+        block.successors = [successor for successor in successors if successor is not None]
+    return blocks
+
+# An indirect jump returns from a function, it is taken to go to any return
+# address pushed by a reachable call. So functions that are never called
+# are never reached, neither are the returns of calls in them.
+def reachable_blocks(blocks):
+    reached = [False] * len(blocks)
+    if not blocks:
+        return reached
+    reached[0] = True
+    worklist = [0]
+    return_sites = []
+    returns = False
+    while worklist:
+        block = blocks[worklist.pop()]
+        successors = list(block.successors)
+        return_sites.extend(block.return_sites)
+        if returns:
+            successors.extend(block.return_sites)
+        if block.returns and not returns:
+            returns = True
+            successors.extend(return_sites)
+        for successor in successors:
+            if not reached[successor]:
+                reached[successor] = True
+                worklist.append(successor)
+    return reached
+
+# Removes the blocks no run can reach. Returns the new PB and the new
+# address_lines
+def eliminate_dead_code(pb, address_lines=()):
+    blocks = build_cfg(pb, address_lines)
+    keep = [False] * len(pb)
+    for block, reached in zip(blocks, reachable_blocks(blocks)):
+        if reached:
+            keep[block.start:block.end] = [True] * (block.end - block.start)
+    return remove_lines(pb, address_lines, keep)
+
+# Removes the lines that keep is False for and renumbers the jump targets and
+# the return addresses of address_lines, a target that was removed becomes
+# the next line kept. Returns the new PB and the new address_lines
+def remove_lines(pb, address_lines, keep):
+    new_lineno = [0] * (len(pb) + 1)
+    for i in range(len(pb)):
+        new_lineno[i + 1] = new_lineno[i] + keep[i]
+
+    code = list(pb)
+    for i, instruction in enumerate(code):
+        target = _target(instruction)
+        if keep[i] and target is not None and target[0] == Mode.DIRECT:
+            code[i] = instruction.replace(JUMP_TARGETS[instruction.opcode],
+                                          direct(new_lineno[min(target[1], len(pb))]))
+    for lineno in address_lines:
+        target = code[lineno].operands[0][1]
+        code[lineno] = code[lineno].replace(0, immediate(new_lineno[min(target, len(pb))]))
+    return [code[i] for i in range(len(pb)) if keep[i]], \
+        [new_lineno[lineno] for lineno in address_lines if keep[lineno]]
@@ -1,5 +1,9 @@
 from enum import Enum
 from utils.symbol_table import SymbolTable
+from utils.instruction import Instruction, immediate, direct, indirect
+from utils import peephole
+from utils import cfg
+from utils import cse
 
 class ActionSymbol(Enum):
     PUSH_ID = '_push_id'
@@ -59,6 +63,7 @@ class CodeGenerator:
     def reset(self):
         self.SS = []
         self.PB = []
+        self.address_lines = []
         self.global_table = SymbolTable()
         self.func_table = None
         self.funcs = {
@@ -67,14 +72,21 @@ class CodeGenerator:
         self.curr_func = None
         self.return_block_lineno = None
         self.loop_blocks = []
+        # Integer constants by the PB line their push starts at
+        self.constants = {}
+        # (pb_lineno, jump_lineno, end, func_name, arrays, result) of the last
+        # call to a function returning int, see _tail_call
+        self.last_call = None
+        self.local_arrays = False
+        self.tail_called = False
 
-        self.emit(f'ASSIGN, #{self.STACK}, {self.SP}, ')
-        self.emit(f'ASSIGN, #{self.STACK}, {self.FP}, ')
+        self.emit('ASSIGN', immediate(self.STACK), direct(self.SP))
+        self.emit('ASSIGN', immediate(self.STACK), direct(self.FP))
 
         self.semantic_errors = []
     
-    def emit(self, code=''):
-        self.PB.append(code)
+    def emit(self, opcode=None, *operands):
+        self.PB.append(Instruction(opcode, *operands))
 
     def add_semantic_error(self, error, lineno):
         self.semantic_errors.append((error, lineno))
@@ -82,24 +94,57 @@ class CodeGenerator:
     def get_semantic_errors(self):
         return self.semantic_errors
 
-    def get_pb(self):
+    # Addresses no indirect access of the generated code goes to
+    def get_registers(self):
+        return self.SP, self.FP, self.TEMP
+
+    def get_pb(self, optimize=False):
+        if optimize:
+            pb, address_lines = cfg.eliminate_dead_code(self.PB, self.address_lines)
+            pb, address_lines = cse.eliminate_common_subexpressions(pb, address_lines,
+                                                                    self.get_registers())
+            return peephole.optimize(pb, address_lines)
         return self.PB
 
     def set_push_code(self, lineno, value):
         if value is not None:
-            self.PB[lineno] = (f'ASSIGN, {value}, @{self.SP}, ')
+            self.PB[lineno] = Instruction('ASSIGN', value, indirect(self.SP))
             lineno += 1
-        self.PB[lineno] = (f'ADD, {self.SP}, #4, {self.SP}')
+        self.PB[lineno] = Instruction('ADD', direct(self.SP), immediate(4), direct(self.SP))
 
     def pop_code(self):
-        self.emit(f'SUB, {self.SP}, #4, {self.SP}')
+        self.emit('SUB', direct(self.SP), immediate(4), direct(self.SP))
 
     def push_code(self, value):
         lineno = len(self.PB)
         if value is not None: self.emit()
-        self.emit(())
+        self.emit()
         self.set_push_code(lineno, value)
 
+    def push_constant(self, value):
+        self.constants[len(self.PB)] = value
+        self.push_code(immediate(value))
+
+    # The constant pushed depth pushes below the last two lines of PB, or
+    # None if those lines do not push a constant
+    def pushed_constant(self, depth=0):
+        lineno = len(self.PB) - 2 * (depth + 1)
+        value = self.constants.get(lineno)
+        if value is not None and self.PB[lineno] == Instruction('ASSIGN', immediate(value), indirect(self.SP)):
+            return value
+        return None
+
+    # Removes the push of the constant in the last two lines of PB
+    def pop_constant(self):
+        del self.PB[-2:]
+        self.constants.pop(len(self.PB), None)
+
+    def fold(self, opr, left, right):
+        return (left + right if opr == '+' else \
+                left - right if opr == '-' else \
+                left * right if opr == '*' else \
+                int(left < right) if opr == '<' else int(left == right))
+
     def code_gen(self, name, lookahead, input_lineno):
         return self.__getattribute__(name)(lookahead, input_lineno)
 
@@ -108,6 +153,7 @@ class CodeGenerator:
 
     def _begin_func(self, lookahead, input_lineno):
         self.func_table = SymbolTable(0)
+        self.local_arrays = False
         for param_name, param_type in self.funcs[self.curr_func][2]:
             self.func_table.add_symbol(param_name, 1 if param_type == 'array' else None, True)
 
@@ -139,12 +185,13 @@ class CodeGenerator:
             self.global_table.add_symbol(name, size)
         else:
             self.func_table.add_symbol(name, size)
-        self.emit(f'ADD, {self.SP}, #{4 * size}, {self.SP}')
+            self.local_arrays = True
+        self.emit('ADD', direct(self.SP), immediate(4 * size), direct(self.SP))
 
     def _push_stack(self, lookahead, input_lineno):
         token = self.SS.pop()
         if token.isdigit():
-            self.push_code(f'#{token}')
+            self.push_constant(int(token))
             self.SS.append('int')
         else:
             symbol = self.func_table.get_symbol(token)
@@ -155,10 +202,10 @@ class CodeGenerator:
                     self.SS.append('int')
                     return
                 else:
-                    self.push_code(f'{symbol[0]}' if symbol[1] is None else f'#{symbol[0]}')
+                    self.push_code(direct(symbol[0]) if symbol[1] is None else immediate(symbol[0]))
             else:
-                self.emit(f'ADD, {self.FP}, #{symbol[0]}, {self.TEMP}')
-                self.push_code(f'@{self.TEMP}' if symbol[1] is None or symbol[2] else f'{self.TEMP}')
+                self.emit('ADD', direct(self.FP), immediate(symbol[0]), direct(self.TEMP))
+                self.push_code(indirect(self.TEMP) if symbol[1] is None or symbol[2] else direct(self.TEMP))
             self.SS.append('int' if symbol[1] is None else 'array')
 
     def _pop_stack(self, lookahead, input_lineno):
@@ -177,10 +224,10 @@ class CodeGenerator:
                 self.SS.append('int')
                 return
             else:
-                self.emit(f'ASSIGN, @{self.SP}, {symbol[0]}, ')
+                self.emit('ASSIGN', indirect(self.SP), direct(symbol[0]))
         else:
-            self.emit(f'ADD, {self.FP}, #{symbol[0]}, {self.TEMP}')
-            self.emit(f'ASSIGN, @{self.SP}, @{self.TEMP}, ')
+            self.emit('ADD', direct(self.FP), immediate(symbol[0]), direct(self.TEMP))
+            self.emit('ASSIGN', indirect(self.SP), indirect(self.TEMP))
         lhs_type = 'int' if symbol[1] is None else 'array'
         if rhs_type != lhs_type:
             self.add_semantic_error(f'Type mismatch in operands, Got {lhs_type} instead of {rhs_type}.', input_lineno)
@@ -193,23 +240,44 @@ class CodeGenerator:
         opr_type2 = self.SS.pop()
         if opr_type1 != opr_type2:
             self.add_semantic_error(f'Type mismatch in operands, Got array instead of int.', input_lineno)
-        self.pop_code()
-        self.emit(f'SUB, {self.SP}, #4, {self.TEMP}')
+        self.SS.append('int')
+        right = self.pushed_constant()
+        left = self.pushed_constant(1) if right is not None else None
+        if left is not None:
+            self.pop_constant()
+            self.pop_constant()
+            self.push_constant(self.fold(opr, left, right))
+            return
         opr_code = ('ADD' if opr == '+' else \
                     'SUB' if opr == '-' else \
                     'MULT' if opr == '*' else \
                     'LT' if opr == '<' else 'EQ')
-        self.emit(f'{opr_code}, @{self.TEMP}, @{self.SP}, @{self.TEMP}')
-        self.SS.append('int')
+        if right is not None:
+            # A constant right operand is not pushed but used as immediate,
+            # x + 0, x - 0 and x * 1 leave x on the stack as it is
+            self.pop_constant()
+            if (opr in '+-' and right == 0) or (opr == '*' and right == 1):
+                return
+            self.emit('SUB', direct(self.SP), immediate(4), direct(self.TEMP))
+            self.emit(opr_code, indirect(self.TEMP), immediate(right), indirect(self.TEMP))
+            return
+        self.pop_code()
+        self.emit('SUB', direct(self.SP), immediate(4), direct(self.TEMP))
+        self.emit(opr_code, indirect(self.TEMP), indirect(self.SP), indirect(self.TEMP))
 
     def _negate(self, lookahead, input_lineno):
         type = self.SS.pop()
         if type != 'int':
             self.add_semantic_error(f'Type mismatch in operands, Got array instead of int.', input_lineno)
+        self.SS.append('int')
+        value = self.pushed_constant()
+        if value is not None:
+            self.pop_constant()
+            self.push_constant(-value)
+            return
         self.pop_code()
-        self.emit(f'SUB, #0, @{self.SP}, @{self.SP}')
+        self.emit('SUB', immediate(0), indirect(self.SP), indirect(self.SP))
         self.push_code(None)
-        self.SS.append('int')
 
     def _push_lineno(self, lookahead, input_lineno):
         lineno = len(self.PB)
@@ -221,30 +289,30 @@ class CodeGenerator:
     def _jpf_from_skipped1(self, lookahead, input_lineno):
         pb_lineno = self.SS.pop()
         lineno = len(self.PB)
-        self.PB[pb_lineno] = f'JPF, @{self.SP}, {lineno}, '
+        self.PB[pb_lineno] = Instruction('JPF', indirect(self.SP), direct(lineno))
 
     def _jpf_from_skipped2(self, lookahead, input_lineno):
         pb_lineno = self.SS.pop(-2)
         lineno = len(self.PB)
-        self.PB[pb_lineno] = f'JPF, @{self.SP}, {lineno}, '
+        self.PB[pb_lineno] = Instruction('JPF', indirect(self.SP), direct(lineno))
 
     def _jp_from_skipped1(self, lookahead, input_lineno):
         pb_lineno = self.SS.pop()
         lineno = len(self.PB)
-        self.PB[pb_lineno] = f'JP, {lineno}, , '
+        self.PB[pb_lineno] = Instruction('JP', direct(lineno))
 
     def _jp_from_skipped2(self, lookahead, input_lineno):
         pb_lineno = self.SS.pop(-2)
         lineno = len(self.PB)
-        self.PB[pb_lineno] = f'JP, {lineno}, , '
+        self.PB[pb_lineno] = Instruction('JP', direct(lineno))
 
     def _jp_to_skipped1(self, lookahead, input_lineno):
         label = self.SS.pop()
-        self.emit(f'JP, {label}, , ')
+        self.emit('JP', direct(label))
 
     def _jp_to_skipped4(self, lookahead, input_lineno):
         label = self.SS.pop(-4)
-        self.emit(f'JP, {label}, , ')
+        self.emit('JP', direct(label))
 
     def _register_func(self, lookahead, input_lineno):
         func_name = self.SS.pop()
@@ -260,11 +328,11 @@ class CodeGenerator:
 
     def _param_type_to_arr(self, lookahead, input_lineno):
         self.return_block_lineno = len(self.PB)
-        self.emit(f'SUB, {self.FP}, #4, {self.SP}')
-        self.emit(f'ASSIGN, @{self.SP}, {self.FP}, ')
+        self.emit('SUB', direct(self.FP), immediate(4), direct(self.SP))
+        self.emit('ASSIGN', indirect(self.SP), direct(self.FP))
         self.pop_code()
-        self.emit(f'ASSIGN, @{self.SP}, {self.TEMP}, ')
-        self.emit(f'JP, @{self.TEMP}, , ')
+        self.emit('ASSIGN', indirect(self.SP), direct(self.TEMP))
+        self.emit('JP', indirect(self.TEMP))
 
     def _call_func(self, lookahead, input_lineno):
         args = []
@@ -288,40 +356,81 @@ class CodeGenerator:
             self._output(pb_lineno)
             return
         self.set_push_code(pb_lineno, None)
-        self.emit(f'SUB, {self.SP}, #{4 * len(func[2])}, {self.FP}')
-        self.emit(f'JP, {func[1]}, , ')
+        self.emit('SUB', direct(self.SP), immediate(4 * len(func[2])), direct(self.FP))
+        self.emit('JP', direct(func[1]))
         lineno = len(self.PB)
-        self.set_push_code(pb_lineno+1, f'#{lineno}')
+        self.set_push_code(pb_lineno+1, immediate(lineno))
+        self.address_lines.append(pb_lineno+1)
         if func[0] == 'void':
             self.pop_code()
+        else:
+            self.last_call = (pb_lineno, lineno - 2, lineno, func_name, 'array' in args, None)
         self.SS.append('int')
 
     def _call_main(self, lookahead, input_lineno):
         pb_lineno = self.SS.pop()
         lineno = len(self.PB)
-        self.set_push_code(pb_lineno, f'#{lineno}')
-        self.PB[pb_lineno + 4] = f'ASSIGN, {self.SP}, {self.FP}, '
-        self.PB[pb_lineno + 5] = f'JP, {self.funcs["main"][1]}, , '
+        self.set_push_code(pb_lineno, immediate(lineno))
+        self.address_lines.append(pb_lineno)
+        self.PB[pb_lineno + 4] = Instruction('ASSIGN', direct(self.SP), direct(self.FP))
+        self.PB[pb_lineno + 5] = Instruction('JP', direct(self.funcs['main'][1]))
 
     def _push_fp_value(self, lookahead, input_lineno):
-        self.push_code(f'{self.FP}')
+        self.push_code(direct(self.FP))
 
     def _return_code_block(self, lookahead, input_lineno):
         self.return_block_lineno = len(self.PB)
-        self.emit(f'SUB, {self.FP}, #4, {self.SP}')
-        self.emit(f'ASSIGN, @{self.SP}, {self.FP}, ')
+        self.emit('SUB', direct(self.FP), immediate(4), direct(self.SP))
+        self.emit('ASSIGN', indirect(self.SP), direct(self.FP))
         self.pop_code()
-        self.emit(f'ASSIGN, @{self.SP}, {self.TEMP}, ')
-        self.emit(f'JP, @{self.TEMP}, , ')
+        self.emit('ASSIGN', indirect(self.SP), direct(self.TEMP))
+        self.emit('JP', indirect(self.TEMP))
 
     def _func_return(self, lookahead, input_lineno):
-        self.emit(f'JP, {self.return_block_lineno}, , ')
+        if self.tail_called:
+            self.tail_called = False
+            return
+        self.emit('JP', direct(self.return_block_lineno))
 
     def _set_func_return_value(self, lookahead, input_lineno):
-        self.pop_code()
         self.SS.pop()
-        self.emit(f'SUB, {self.FP}, #12, {self.TEMP}')
-        self.emit(f'ASSIGN, @{self.SP}, @{self.TEMP}, ')
+        if self._tail_call():
+            return
+        self.pop_code()
+        self.emit('SUB', direct(self.FP), immediate(12), direct(self.TEMP))
+        self.emit('ASSIGN', indirect(self.SP), indirect(self.TEMP))
+
+    # A call whose value is returned as it is reuses the frame of the
+    # function returning it: the arguments are copied over the parameters
+    # and the callee returns to where the function would have, so recursion
+    # in tail position runs in constant stack space. The return slot, return
+    # address and FP pushes of the call are jumped over and everything from
+    # jump_lineno, where FP is set for the call, up to end is replaced.
+    # An array argument may be a local array of the frame, so the call is
+    # kept if the function has one. result is the operand returned, if the
+    # code generator has operands
+    def _tail_call(self, result=None):
+        if self.last_call is None:
+            return False
+        pb_lineno, jump_lineno, end, func_name, arrays, call_result = self.last_call
+        self.last_call = None
+        if end != len(self.PB) or result != call_result or self.funcs[self.curr_func][0] != 'int' \
+                or (arrays and self.local_arrays):
+            return False
+        params = len(self.funcs[func_name][2])
+        self.PB[pb_lineno] = Instruction('JP', direct(pb_lineno + 5))
+        self.address_lines.remove(pb_lineno + 1)
+        del self.PB[jump_lineno:]
+        if params:
+            self.emit('SUB', direct(self.SP), immediate(4 * params), direct(self.TEMP))
+        self.emit('ASSIGN', direct(self.FP), direct(self.SP))
+        for i in range(params):
+            if i:
+                self.emit('ADD', direct(self.TEMP), immediate(4), direct(self.TEMP))
+            self.push_code(indirect(self.TEMP))
+        self.emit('JP', direct(self.funcs[func_name][1]))
+        self.tail_called = True
+        return True
 
     def _push_arr_index_addr(self, lookahead, input_lineno):
         type = self.SS.pop()
@@ -329,25 +438,45 @@ class CodeGenerator:
             self.add_semantic_error(f'Type mismatch in operands, Got array instead of int.', input_lineno)
         token = self.SS.pop()
         symbol = self.func_table.get_symbol(token)
+        index = self.pushed_constant()
+        if index is not None:
+            self._push_constant_index_addr(symbol, token, index)
+            self.SS.append('int')
+            return
         self.pop_code()
-        self.emit(f'MULT, @{self.SP}, #4, @{self.SP}')
+        self.emit('MULT', indirect(self.SP), immediate(4), indirect(self.SP))
         if symbol is None:
             symbol = self.global_table.get_symbol(token)
-            self.emit(f'ADD, #{symbol[0]}, @{self.SP}, {self.TEMP}')
-            self.push_code(f'{self.TEMP}')
+            self.emit('ADD', immediate(symbol[0]), indirect(self.SP), direct(self.TEMP))
+            self.push_code(direct(self.TEMP))
         else:
-            self.emit(f'ADD, {self.FP}, #{symbol[0]}, {self.TEMP}')
+            self.emit('ADD', direct(self.FP), immediate(symbol[0]), direct(self.TEMP))
             if symbol[2]:
-                self.emit(f'ADD, @{self.TEMP}, @{self.SP}, {self.TEMP}')
+                self.emit('ADD', indirect(self.TEMP), indirect(self.SP), direct(self.TEMP))
             else:
-                self.emit(f'ADD, {self.TEMP}, @{self.SP}, {self.TEMP}')
-            self.push_code(f'{self.TEMP}')
+                self.emit('ADD', direct(self.TEMP), indirect(self.SP), direct(self.TEMP))
+            self.push_code(direct(self.TEMP))
         self.SS.append('int')
 
+    # The offset of a constant index is added without computing it at runtime,
+    # the address of a global array element is pushed as a constant
+    def _push_constant_index_addr(self, symbol, token, index):
+        self.pop_constant()
+        if symbol is None:
+            symbol = self.global_table.get_symbol(token)
+            self.push_code(immediate(symbol[0] + 4 * index))
+        else:
+            self.emit('ADD', direct(self.FP), immediate(symbol[0]), direct(self.TEMP))
+            if symbol[2]:
+                self.emit('ADD', indirect(self.TEMP), immediate(4 * index), direct(self.TEMP))
+            else:
+                self.emit('ADD', direct(self.TEMP), immediate(4 * index), direct(self.TEMP))
+            self.push_code(direct(self.TEMP))
+
     def _push_addr_value(self, lookahead, input_lineno):
         self.pop_code()
-        self.emit(f'ASSIGN, @{self.SP}, {self.TEMP}, ')
-        self.push_code(f'@{self.TEMP}')
+        self.emit('ASSIGN', indirect(self.SP), direct(self.TEMP))
+        self.push_code(indirect(self.TEMP))
 
     def _arr_assign(self, lookahead, input_lineno):
         rhs_type = self.SS.pop()
@@ -356,12 +485,12 @@ class CodeGenerator:
             self.add_semantic_error(f'Type mismatch in operands, Got array instead of int.', input_lineno)
         self.pop_code()
         self.pop_code()
-        self.emit(f'ASSIGN, @{self.SP}, {self.TEMP}, ')
+        self.emit('ASSIGN', indirect(self.SP), direct(self.TEMP))
         self.push_code(None)
-        self.emit(f'ASSIGN, @{self.SP}, @{self.TEMP}, ')
-        self.emit(f'ASSIGN, @{self.SP}, {self.TEMP}, ')
+        self.emit('ASSIGN', indirect(self.SP), indirect(self.TEMP))
+        self.emit('ASSIGN', indirect(self.SP), direct(self.TEMP))
         self.pop_code()
-        self.push_code(f'{self.TEMP}')
+        self.push_code(direct(self.TEMP))
         self.SS.append('int')
 
     def _begin_loop(self, lookahead, input_lineno):
@@ -370,7 +499,7 @@ class CodeGenerator:
     def _end_loop(self, lookahead, input_lineno):
         lineno = len(self.PB)
         for break_stmt_line in self.loop_blocks[-1]:
-            self.PB[break_stmt_line] = f'JP, {lineno}, , '
+            self.PB[break_stmt_line] = Instruction('JP', direct(lineno))
         self.loop_blocks.pop()
 
     def _break_statement(self, lookahead, input_lineno):
@@ -388,10 +517,10 @@ class CodeGenerator:
         self.SS.pop()
 
     def _output(self, pb_lineno):
-        self.PB[pb_lineno] = f'ASSIGN, 0, 0, '
-        self.PB[pb_lineno+1] = f'ASSIGN, 0, 0, '
-        self.PB[pb_lineno+2] = f'ASSIGN, 0, 0, '
+        self.PB[pb_lineno] = Instruction('ASSIGN', direct(0), direct(0))
+        self.PB[pb_lineno+1] = Instruction('ASSIGN', direct(0), direct(0))
+        self.PB[pb_lineno+2] = Instruction('ASSIGN', direct(0), direct(0))
         self.pop_code()
-        self.emit(f'PRINT, @{self.SP}, , ')
+        self.emit('PRINT', indirect(self.SP))
         self.pop_code()
         self.SS.append('int')
\ No newline at end of file
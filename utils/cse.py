@@ -0,0 +1,202 @@
+from itertools import count
+from utils.instruction import Mode
+from utils import cfg
+
+# Operations of two values and how they are computed on constants, the
+# other ones and NOT are only numbered. NOT is left out since it makes a
+# bool and PRINT tells True from 1
+FOLDS = {
+    'ADD': lambda x0, x1: x0 + x1,
+    'SUB': lambda x0, x1: x0 - x1,
+    'MULT': lambda x0, x1: x0 * x1,
+    'EQ': lambda x0, x1: int(x0 == x1),
+    'LT': lambda x0, x1: int(x0 < x1),
+}
+OPERATIONS = ('ADD', 'AND', 'DIV', 'EQ', 'LT', 'MULT', 'SUB')
+
+class _Block:
+    # Values are (root, offset) pairs, the value root + offset. A root of
+    # None is a constant and any other root is a number given to a value
+    # read from memory or computed in the block, so a value plus or minus a
+    # constant shares the root of the value. memory maps the addresses
+    # written or read in the block to the values held there, a direct
+    # address being the constant value (None, address). registers are the
+    # addresses the code generator keeps for itself, an indirect access
+    # never goes to them.
+    def __init__(self, registers, numbers):
+        self.registers = registers
+        self.numbers = numbers
+        self.memory = {}
+        self.computed = {}
+        self.flags = set()
+
+    def _new_value(self):
+        return next(self.numbers), 0
+
+    def address(self, operand):
+        mode, value = operand
+        if mode == Mode.DIRECT:
+            return None, value
+        return self.read((Mode.DIRECT, value))
+
+    def read(self, operand):
+        if operand[0] == Mode.IMMEDIATE:
+            return None, operand[1]
+        address = self.address(operand)
+        if address not in self.memory:
+            self.memory[address] = self._new_value()
+        return self.memory[address]
+
+    # Two addresses are apart when they differ by a constant, or when one is a
+    # register and the other one is indirect
+    def _apart(self, address, other):
+        if address[0] == other[0]:
+            return address[1] != other[1]
+        if address[0] is None:
+            return address[1] in self.registers
+        return other[0] is None and other[1] in self.registers
+
+    def write(self, address, value):
+        for other in list(self.memory):
+            if not self._apart(address, other):
+                del self.memory[other]
+        self.memory[address] = value
+
+    def compute(self, opcode, values):
+        if len(values) == 2:
+            x0, x1 = values
+            if x0[0] is None and x1[0] is None and opcode in FOLDS:
+                return None, FOLDS[opcode](x0[1], x1[1])
+            if opcode == 'ADD' and x1[0] is None and x0[0] not in self.flags:
+                return x0[0], x0[1] + x1[1]
+            if opcode == 'ADD' and x0[0] is None and x1[0] not in self.flags:
+                return x1[0], x0[1] + x1[1]
+            if opcode == 'SUB' and x1[0] is None and x0[0] not in self.flags:
+                return x0[0], x0[1] - x1[1]
+            if opcode == 'SUB' and x0[0] == x1[0] and x0[0] not in self.flags:
+                return None, x0[1] - x1[1]
+        key = (opcode,) + tuple(values)
+        if key not in self.computed:
+            self.computed[key] = self._new_value()
+            if opcode == 'NOT':
+                self.flags.add(self.computed[key][0])
+        return self.computed[key]
+
+    # Returns the address instruction writes and the value it writes there,
+    # or None for the instructions that write nothing
+    def evaluate(self, instruction):
+        opcode, operands = instruction.opcode, instruction.operands
+        if opcode == 'ASSIGN':
+            value = self.read(operands[0])
+        elif opcode in OPERATIONS or opcode == 'NOT':
+            value = self.compute(opcode, [self.read(operand) for operand in operands[:-1]])
+        else:
+            if opcode in ('JPF', 'PRINT'):
+                self.read(operands[0])
+            return None
+        return self.address(operands[-1]), value
+
+    # A register other than address holding value
+    def holder(self, value, address):
+        for other, held in self.memory.items():
+            if held == value and other[0] is None and other[1] in self.registers \
+                    and other != address:
+                return other[1]
+        return None
+
+# Indexes of the operands whose address is read, the last operand of an
+# instruction writing to memory is only read when indirect and the targets
+# of JP and JPF only when indirect
+def _reads(instruction):
+    opcode, operands = instruction.opcode, instruction.operands
+    if opcode in cfg.JUMP_TARGETS:
+        target = cfg.JUMP_TARGETS[opcode]
+        return [i for i in range(len(operands))
+                if i != target or operands[i][0] == Mode.INDIRECT]
+    if opcode == 'PRINT':
+        return [0]
+    if opcode == 'ASSIGN' or opcode in OPERATIONS or opcode == 'NOT':
+        return [i for i in range(len(operands))
+                if operands[i][0] != Mode.IMMEDIATE
+                and (i < len(operands) - 1 or operands[i][0] == Mode.INDIRECT)]
+    return []
+
+def _direct_destination(instruction):
+    opcode, operands = instruction.opcode, instruction.operands
+    if opcode == 'ASSIGN' or opcode in OPERATIONS or opcode == 'NOT':
+        if operands[-1][0] == Mode.DIRECT:
+            return operands[-1][1]
+    return None
+
+# The registers some block reads before writing them, they may hold a value
+# from another block
+def _live_in(pb, blocks, registers):
+    live = set()
+    for block in blocks:
+        written = set()
+        for instruction in pb[block.start:block.end]:
+            for i in _reads(instruction):
+                address = instruction.operands[i][1]
+                if address in registers and address not in written:
+                    live.add(address)
+            written.add(_direct_destination(instruction))
+    return live
+
+# Makes the instructions of code after lineno up to end read register copy
+# instead of address until address is written again. Fails if copy is
+# written before the last read or address may be read after end
+def _forward(code, lineno, end, address, copy, live):
+    forwarded = {}
+    copy_written = False
+    for lineno in range(lineno + 1, end):
+        instruction = code[lineno]
+        reads = [i for i in _reads(instruction) if instruction.operands[i][1] == address]
+        if reads:
+            if copy_written:
+                return False
+            for i in reads:
+                instruction = instruction.replace(i, (instruction.operands[i][0], copy))
+            forwarded[lineno] = instruction
+        destination = _direct_destination(instruction)
+        if destination == address:
+            break
+        copy_written = copy_written or destination == copy
+    else:
+        if address in live:
+            return False
+    for lineno, instruction in forwarded.items():
+        code[lineno] = instruction
+    return True
+
+# Removes the instructions writing a value their destination already holds
+# in the same basic block, like a frame address computed again into TEMP or
+# a stack value loaded back to where it came from. A register written a
+# value another register holds is not written at all, its reads in the
+# block go to the other register. registers are the addresses only the code
+# generator uses. Returns the new PB and the new address_lines
+def eliminate_common_subexpressions(pb, address_lines=(), registers=()):
+    registers = frozenset(registers)
+    numbers = count()
+    code = list(pb)
+    keep = [True] * len(code)
+    fixed = set(address_lines)
+    blocks = cfg.build_blocks(code, address_lines)
+    live = _live_in(code, blocks, registers)
+    for block in blocks:
+        state = _Block(registers, numbers)
+        for lineno in range(block.start, block.end):
+            written = state.evaluate(code[lineno])
+            if written is None:
+                continue
+            address, value = written
+            if lineno not in fixed:
+                if state.memory.get(address) == value:
+                    keep[lineno] = False
+                    continue
+                copy = state.holder(value, address) if address[0] is None \
+                    and address[1] in registers else None
+                if copy is not None and _forward(code, lineno, block.end, address[1], copy, live):
+                    keep[lineno] = False
+                    continue
+            state.write(address, value)
+    return cfg.remove_lines(code, address_lines, keep)
@@ -79,36 +79,76 @@ class DFA:
         (States.WHS, Character.all, States.WHS_Final)
     ]
 
+    # Characters outside of the table are all mapped to its last column
+    CHARSET_SIZE = 128
+
+    state_list = list(States)
+    INIT_INDEX = state_list.index(States.INIT)
+    TRASH_INDEX = state_list.index(States.TRASH)
+
+    error_flags = [state.value.has_error() for state in state_list]
+    final_flags = [state.value.is_final() for state in state_list]
+    lookahead_flags = [state.value.is_lookahead() for state in state_list]
+    stop_flags = [state.value.is_final() or state.value.has_error() for state in state_list]
+    token_types = [state.value.get_token_type() for state in state_list]
+
     def __init__(self):
         self.reset()
 
     def reset(self):
+        self.current_index = self.INIT_INDEX
         self.current_state = self.States.INIT
 
+    @classmethod
+    def build_table(cls):
+        table = [[None] * (cls.CHARSET_SIZE + 1) for _ in cls.state_list]
+        for state, char_class, to_state in cls.transitions:
+            row = table[cls.state_list.index(state)]
+            for char in char_class:
+                if row[ord(char)] is None:
+                    row[ord(char)] = cls.state_list.index(to_state)
+        return [[cls.TRASH_INDEX if index is None else index for index in row] for row in table]
+
     def proceed(self, next_char: str):
-        for state, char_class, to_state in self.transitions:
-            if state == self.current_state and next_char in char_class:
-                self.current_state = to_state
-                return True
-        self.current_state = self.States.TRASH
-        return False
+        self.current_index = self.table[self.current_index][min(ord(next_char), self.CHARSET_SIZE)]
+        self.current_state = self.state_list[self.current_index]
+        return self.current_index != self.TRASH_INDEX
+
+    # Proceeds over text from pos until a final or error state is reached
+    # and returns the position of the first character not consumed
+    def run(self, text: str, pos: int):
+        table, stop_flags, size = self.table, self.stop_flags, self.CHARSET_SIZE
+        index = self.current_index
+        end = len(text)
+        while pos < end:
+            index = table[index][min(ord(text[pos]), size)]
+            if stop_flags[index]:
+                if not self.lookahead_flags[index]:
+                    pos += 1
+                break
+            pos += 1
+        self.current_index = index
+        self.current_state = self.state_list[index]
+        return pos
 
     def has_error(self):
-        return self.current_state.value.has_error()
+        return self.error_flags[self.current_index]
 
     def is_acceptable(self):
-        return not self.current_state.value.has_error() and \
+        return not self.error_flags[self.current_index] and \
                     self.current_state != self.States.COM_OPEN and \
                     self.current_state != self.States.COM_CLOSE
 
     def is_final(self):
-        return self.current_state.value.is_final()
+        return self.final_flags[self.current_index]
 
     def is_lookahead(self):
-        return self.current_state.value.is_lookahead()
+        return self.lookahead_flags[self.current_index]
 
     def get_token_type(self):
-        return self.current_state.value.get_token_type()
+        return self.token_types[self.current_index]
 
     def get_current_state(self):
-        return self.current_state
\ No newline at end of file
+        return self.current_state
+
+DFA.table = DFA.build_table()
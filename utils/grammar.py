@@ -1,8 +1,8 @@
 from enum import Enum
-from anytree import Node
 from utils.token import Token
 from utils.error import MissingSymbolError, IllegalTerminalError, UnexpectedEOFError
 from utils.codegen import ActionSymbol, CodeGenerator
+from utils.parse_tree import ParseTree
 
 class Terminal(Enum):
     ID = 'ID'
@@ -61,6 +61,12 @@ class NonTerminal:
     def get_follow(self):
         return self.follow
 
+class TableEntry(Enum):
+    RULE = 'rule'
+    EPSILON = 'epsilon'
+    MISSING = 'missing'
+    EOF = 'eof'
+
 class Grammar:
     class States(Enum):
         Program = NonTerminal('Program', [Terminal.INT, Terminal.VOID, Terminal.EPSILON], [Terminal.DOLLAR])
@@ -419,14 +425,64 @@ class Grammar:
         ]
     }
 
-    def __init__(self, code_generator : CodeGenerator):
+    # Maps (NonTerminal state, Terminal) to (TableEntry, rule), terminals with
+    # no entry for a state are illegal there
+    @classmethod
+    def build_table(cls):
+        table = {}
+        conflicts = []
+        for state in cls.States:
+            first = state.get_first()
+            follow = state.get_follow()
+            for possible_terminals, rule in cls.rules.get(state, {}).items():
+                for terminal in possible_terminals:
+                    if terminal == Terminal.EPSILON:
+                        continue
+                    if (state, terminal) in table:
+                        conflicts.append((state, terminal))
+                        continue
+                    table[(state, terminal)] = (TableEntry.RULE, rule)
+            # A production claiming part of the follow set of a nullable
+            # state is only valid if it is the nullable production itself
+            for possible_terminals, rule in cls.rules.get(state, {}).items():
+                if Terminal.EPSILON in first and \
+                    not set(follow) <= set(possible_terminals) and \
+                    set(follow) & set(possible_terminals):
+                    conflicts.extend((state, terminal) for terminal in set(follow) & set(possible_terminals))
+            for terminal in follow:
+                if (state, terminal) not in table:
+                    entry = TableEntry.EPSILON if Terminal.EPSILON in first else TableEntry.MISSING
+                    table[(state, terminal)] = (entry, cls.epsilon_rules.get(state, []))
+            if (state, Terminal.DOLLAR) not in table:
+                table[(state, Terminal.DOLLAR)] = (TableEntry.EOF, None)
+        return table, conflicts
+
+    @classmethod
+    def dump_table(cls, file):
+        for (state, terminal), (entry, rule) in cls.table.items():
+            if entry == TableEntry.RULE:
+                production = ' '.join(var.get_name() for var in rule)
+            else:
+                production = entry.value
+            file.write(f'{state.get_name()}\t{terminal.value}\t{production}\n')
+        for state, terminal in cls.conflicts:
+            file.write(f'CONFLICT\t{state.get_name()}\t{terminal.value}\n')
+
+    def __init__(self, code_generator : CodeGenerator, build_tree=True, tree=None):
         self.code_generator = code_generator
+        self.build_tree = build_tree
+        if tree is None and build_tree:
+            tree = ParseTree()
+        self.tree = tree
         self.reset()
 
     def reset(self):
         self.state_stack = [self.States.Program]
-        self.root_node = Node(self.get_current_state().get_name())
-        self.node_stack = [self.root_node]
+        if self.build_tree:
+            self.tree.reset()
+            self.node_stack = [self.tree.add_node(self.get_current_state().get_name())]
+        else:
+            self.node_stack = []
         self.has_reached_eof = False
 
     def is_terminal_state(self, state=None):
@@ -436,24 +492,23 @@ class Grammar:
         return isinstance(state if state else self.get_current_state(), ActionSymbol)
 
     def _clear_unused_nodes(self, current_node=None):
-        if not current_node:
+        if not self.build_tree:
+            return
+        if current_node is None:
             for node in self.node_stack:
-                node.parent = None
+                self.tree.detach(node)
             return
-        while current_node:
-            parent_node = current_node.parent
-            current_node.parent = None
-            if not parent_node.children:
-                current_node = parent_node
-            else:
-                current_node = None
-        return
+        self.tree.prune(current_node)
 
     def _apply(self, rule=None):
         self.state_stack.pop()
+        if not self.build_tree:
+            if rule:
+                self.state_stack.extend(reversed(rule))
+            return
         parent_node = self.node_stack.pop()
         if rule:
-            current_node_list = [Node(var.get_name(), parent_node) for var in rule]
+            current_node_list = [self.tree.add_node(var.get_name(), parent_node) for var in rule]
             for var in reversed(rule):
                 self.state_stack.append(var)
             self.node_stack.extend(reversed(current_node_list))
@@ -466,43 +521,44 @@ class Grammar:
         raise MissingSymbolError(current_state.value)
 
     def proceed(self, terminal: Terminal, lexeme=None, lineno=None):
-        if self.is_final():
-            self.has_reached_eof = True
-            Node(Terminal.DOLLAR.get_name(), self.get_root_node())
-            self._clear_unused_nodes()
-            return True
-        current_state = self.get_current_state()
-        current_node = self.get_current_node()
-        if self.is_terminal_state():
-            try:
-                ret_value = self._match(terminal)
-                current_node.name = terminal.get_name(lexeme)
-                return ret_value
-            except MissingSymbolError as me:
-                self._clear_unused_nodes(current_node)
-                raise me
-        elif self.is_action_symbol():
-            self.code_generator.code_gen(self.get_current_state().value, lexeme, lineno)
-            self._apply()
-            return self.proceed(terminal, lexeme, lineno)
-        for possible_terminals, rule in self.rules[current_state].items():
-            if terminal in possible_terminals:
+        while True:
+            if self.is_final():
+                self.has_reached_eof = True
+                if self.build_tree:
+                    self.tree.add_leaf(Terminal.DOLLAR.get_name(), ParseTree.ROOT)
+                self._clear_unused_nodes()
+                return True
+            current_state = self.get_current_state()
+            current_node = self.get_current_node()
+            if self.is_terminal_state():
+                try:
+                    ret_value = self._match(terminal)
+                    if self.build_tree:
+                        self.tree.set_name(current_node, terminal.get_name(lexeme))
+                    return ret_value
+                except MissingSymbolError as me:
+                    self._clear_unused_nodes(current_node)
+                    raise me
+            elif self.is_action_symbol():
+                self.code_generator.code_gen(current_state.value, lexeme, lineno)
+                self._apply()
+                if self.build_tree:
+                    self.tree.complete(current_node)
+                continue
+            entry, rule = self.table.get((current_state, terminal), (None, None))
+            if entry == TableEntry.RULE:
                 self._apply(rule)
-                return self.proceed(terminal, lexeme, lineno)
-        else:
-            if Terminal.EPSILON in current_state.get_first() \
-                and terminal in current_state.get_follow():
+            elif entry == TableEntry.EPSILON:
                 self._apply()
-                Node(Terminal.EPSILON.get_name(), current_node)
-                if current_state in self.epsilon_rules:
-                    for action in self.epsilon_rules[current_state]:
-                        self.code_generator.code_gen(action.value, None, lineno)
-                return self.proceed(terminal, lexeme, lineno)
-            elif terminal in current_state.get_follow():
+                if self.build_tree:
+                    self.tree.add_leaf(Terminal.EPSILON.get_name(), current_node)
+                for action in rule:
+                    self.code_generator.code_gen(action.value, None, lineno)
+            elif entry == TableEntry.MISSING:
                 self._clear_unused_nodes(current_node)
                 self._apply()
                 raise MissingSymbolError(current_state.get_name())
-            elif terminal == Terminal.DOLLAR:
+            elif entry == TableEntry.EOF:
                 self.has_reached_eof = True
                 self._clear_unused_nodes()
                 raise UnexpectedEOFError()
@@ -525,5 +581,12 @@ class Grammar:
     def eof_reached(self):
         return self.has_reached_eof
 
-    def get_root_node(self):
-        return self.root_node
\ No newline at end of file
+    def get_parse_tree(self):
+        return self.tree
+
+Grammar.table, Grammar.conflicts = Grammar.build_table()
+
+if __name__ == '__main__':
+    import sys
+    Grammar.dump_table(sys.stdout)
+    sys.exit(1 if Grammar.conflicts else 0)
@@ -0,0 +1,45 @@
+# Operand modes are the prefixes they are written with
+class Mode:
+    IMMEDIATE = '#'
+    DIRECT = ''
+    INDIRECT = '@'
+
+# Text of an instruction by its number of operands
+FORMATS = ('{}, , , ', '{}, {}{}, , ', '{}, {}{}, {}{}, ', '{}, {}{}, {}{}, {}{}')
+
+def immediate(value):
+    return Mode.IMMEDIATE, value
+
+def direct(value):
+    return Mode.DIRECT, value
+
+def indirect(value):
+    return Mode.INDIRECT, value
+
+class Instruction:
+    __slots__ = ('opcode', 'operands')
+
+    # opcode is the command name and operands are (Mode, int) pairs, an
+    # instruction without opcode is a line left to be filled later. The
+    # text of output.txt is only made by str()
+    def __init__(self, opcode=None, *operands):
+        self.opcode = opcode
+        self.operands = operands
+
+    def __str__(self):
+        if self.opcode is None:
+            return ''
+        return FORMATS[len(self.operands)].format(
+            self.opcode, *[part for operand in self.operands for part in operand])
+
+    def __repr__(self):
+        return f'Instruction({str(self)!r})'
+
+    def __eq__(self, other):
+        return isinstance(other, Instruction) and self.opcode == other.opcode \
+            and self.operands == other.operands
+
+    def replace(self, index, operand):
+        operands = list(self.operands)
+        operands[index] = operand
+        return Instruction(self.opcode, *operands)
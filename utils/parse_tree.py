@@ -0,0 +1,264 @@
+from array import array
+
+class ParseTree:
+    NONE = -1
+    ROOT = 0
+
+    # Nodes are indexes into parallel arrays, node names are interned so
+    # every repeated grammar symbol or token shares a single string
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.names = []
+        self.name_ids = {}
+        self.symbols = array('i')
+        self.parents = array('i')
+        self.first_children = array('i')
+        self.last_children = array('i')
+        self.next_siblings = array('i')
+
+    def _intern(self, name):
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def add_node(self, name, parent=NONE):
+        node = len(self.symbols)
+        self.symbols.append(self._intern(name))
+        self.parents.append(self.NONE)
+        self.first_children.append(self.NONE)
+        self.last_children.append(self.NONE)
+        self.next_siblings.append(self.NONE)
+        if parent != self.NONE:
+            self._link(node, parent)
+        return node
+
+    def attach(self, node, parent):
+        self.detach(node)
+        self._link(node, parent)
+
+    def _link(self, node, parent):
+        self.parents[node] = parent
+        last_child = self.last_children[parent]
+        if last_child == self.NONE:
+            self.first_children[parent] = node
+        else:
+            self.next_siblings[last_child] = node
+        self.last_children[parent] = node
+
+    # A node has at most one child per symbol of a grammar rule, so the
+    # sibling before it is found by walking its parent's children
+    def detach(self, node):
+        parent = self.parents[node]
+        if parent == self.NONE:
+            return
+        next_sibling = self.next_siblings[node]
+        previous = self.NONE
+        child = self.first_children[parent]
+        while child != node:
+            previous = child
+            child = self.next_siblings[child]
+        if previous == self.NONE:
+            self.first_children[parent] = next_sibling
+        else:
+            self.next_siblings[previous] = next_sibling
+        if next_sibling == self.NONE:
+            self.last_children[parent] = previous
+        self.parents[node] = self.NONE
+        self.next_siblings[node] = self.NONE
+
+    # Detaches the node and then every ancestor left without children
+    def prune(self, node):
+        while node != self.NONE:
+            parent = self.parents[node]
+            self.detach(node)
+            if parent == self.NONE or self.first_children[parent] != self.NONE:
+                return
+            node = parent
+
+    add_leaf = add_node
+
+    # Nodes are complete once added, the call only matters to ParseTreeWriter
+    def complete(self, node):
+        pass
+
+    def get_name(self, node):
+        return self.names[self.symbols[node]]
+
+    def set_name(self, node, name):
+        self.symbols[node] = self._intern(name)
+
+    def get_parent(self, node):
+        return self.parents[node]
+
+    def get_children(self, node):
+        children = []
+        child = self.first_children[node]
+        while child != self.NONE:
+            children.append(child)
+            child = self.next_siblings[child]
+        return children
+
+
+class _NodeRecord:
+    __slots__ = ('name', 'parent', 'depth', 'offset', 'previous', 'last_child',
+                 'attached', 'unfinished')
+
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.depth = 0
+        self.offset = None
+        self.previous = None
+        self.last_child = None
+        self.attached = 0
+        self.unfinished = 0
+
+
+class ParseTreeWriter:
+    NONE = ParseTree.NONE
+    ROOT = ParseTree.ROOT
+
+    # Takes the same calls as ParseTree but only keeps the nodes still on the
+    # parser's stack and their ancestors. The parser expands nodes in preorder,
+    # so a node is appended to the spill file as a "<last><depth>\t<name>" line
+    # once its name is final. Whether it is the last child of its parent is
+    # only known after a later sibling is written or the parse ends, so the
+    # flag is patched in place and render() turns the spill into the tree text.
+    def __init__(self, spill):
+        self.spill = spill
+        self.reset()
+
+    def reset(self):
+        self.spill.seek(0)
+        self.spill.truncate()
+        self.nodes = {}
+        self.node_count = 0
+
+    def add_node(self, name, parent=NONE):
+        node = self.node_count
+        self.node_count += 1
+        self.nodes[node] = _NodeRecord(name, parent)
+        if parent != self.NONE:
+            record = self.nodes[parent]
+            if record.offset is None:
+                self._write(record)
+            record.attached += 1
+            record.unfinished += 1
+        return node
+
+    def add_leaf(self, name, parent):
+        node = self.add_node(name, parent)
+        self.complete(node)
+        return node
+
+    def set_name(self, node, name):
+        self.nodes[node].name = name
+        self.complete(node)
+
+    def complete(self, node):
+        self._write(self.nodes[node])
+        self._finish(node)
+
+    def _set_last(self, offset, last):
+        self.spill.seek(offset)
+        self.spill.write(b'1' if last else b'0')
+        self.spill.seek(0, 2)
+
+    def _write(self, record):
+        record.offset = self.spill.tell()
+        if record.parent != self.NONE:
+            parent = self.nodes[record.parent]
+            record.depth = parent.depth + 1
+            record.previous = parent.last_child
+            if parent.last_child is not None:
+                self._set_last(parent.last_child, False)
+            parent.last_child = record.offset
+        self.spill.write(f'1{record.depth}\t{record.name}\n'.encode('utf-8'))
+        record.name = None
+
+    # Drops the records of a finished node and of every ancestor it leaves
+    # without unfinished children. Nodes left without any children are kept,
+    # error recovery may still remove them.
+    def _finish(self, node):
+        while node != self.ROOT:
+            parent = self.nodes.pop(node).parent
+            record = self.nodes[parent]
+            record.unfinished -= 1
+            if record.unfinished or not record.attached:
+                return
+            node = parent
+
+    def detach(self, node):
+        record = self.nodes[node]
+        if record.parent == self.NONE:
+            return
+        parent = self.nodes[record.parent]
+        if record.offset is not None:
+            # A removed node has no children left, so it is the last line written
+            self.spill.truncate(record.offset)
+            self.spill.seek(record.offset)
+            parent.last_child = record.previous
+            if record.previous is not None:
+                self._set_last(record.previous, True)
+        parent.attached -= 1
+        self._finish(node)
+
+    def prune(self, node):
+        while node != self.NONE:
+            parent = self.nodes[node].parent
+            if parent == self.NONE:
+                return
+            record = self.nodes[parent]
+            self.detach(node)
+            if record.attached:
+                return
+            node = parent
+
+    # Yields (prefix, name) pairs like render_tree, reading the spill file
+    def render(self):
+        root = self.nodes[self.ROOT]
+        if root.offset is None:
+            self._write(root)
+        self.spill.seek(0)
+        fills = []
+        for line in self.spill:
+            flags, name = line.decode('utf-8').rstrip('\n').split('\t', 1)
+            depth = int(flags[1:])
+            if depth == 0:
+                yield '', name
+                continue
+            del fills[depth - 1:]
+            if flags[0] == '1':
+                yield ''.join(fills) + '└── ', name
+                fills.append('    ')
+            else:
+                yield ''.join(fills) + '├── ', name
+                fills.append('│   ')
+
+
+# Yields (prefix, name) pairs in the same order and format as anytree's RenderTree.
+# Only the next sibling to visit is kept per level, the prefix is joined from
+# the per-level fill segments so memory stays proportional to the tree depth.
+def render_tree(tree):
+    yield '', tree.get_name(ParseTree.ROOT)
+    fills = []
+    stack = [tree.first_children[ParseTree.ROOT]]
+    while stack:
+        node = stack[-1]
+        if node == ParseTree.NONE:
+            stack.pop()
+            if fills:
+                fills.pop()
+            continue
+        stack[-1] = tree.next_siblings[node]
+        if stack[-1] == ParseTree.NONE:
+            yield ''.join(fills) + '└── ', tree.get_name(node)
+            fills.append('    ')
+        else:
+            yield ''.join(fills) + '├── ', tree.get_name(node)
+            fills.append('│   ')
+        stack.append(tree.first_children[node])
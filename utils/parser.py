@@ -5,10 +5,10 @@ from utils.token import Token
 from utils.codegen import CodeGenerator
 
 class Parser:
-    def __init__(self, scanner: Scanner):
+    def __init__(self, scanner: Scanner, build_tree=True, tree=None, code_generator=None):
         self.scanner = scanner
-        self.code_generator = CodeGenerator()
-        self.grammar = Grammar(self.code_generator)
+        self.code_generator = CodeGenerator() if code_generator is None else code_generator
+        self.grammar = Grammar(self.code_generator, build_tree, tree)
         self.reset()
 
     def reset(self):
@@ -68,11 +68,11 @@ class Parser:
     def eof_reached(self):
         return self.has_reached_eof
 
-    def get_root_node(self):
-        return self.grammar.get_root_node()
+    def get_parse_tree(self):
+        return self.grammar.get_parse_tree()
 
     def get_semantic_errors(self):
         return self.code_generator.get_semantic_errors()
     
-    def get_pb(self):
-        return self.code_generator.get_pb()
\ No newline at end of file
+    def get_pb(self, optimize=False):
+        return self.code_generator.get_pb(optimize)
\ No newline at end of file
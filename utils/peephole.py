@@ -0,0 +1,90 @@
+from utils.instruction import Instruction, Mode, immediate, direct
+
+# Index of the target among the operands
+JUMP_TARGETS = {
+    'JP': 0,
+    'JPF': 1,
+}
+
+# Returns (address, amount) for an 'ADD/SUB, x, #n, x' instruction
+def _adjustment(code):
+    if code.opcode not in ('ADD', 'SUB') or len(code.operands) != 3:
+        return None
+    address, amount, dest = code.operands
+    if address != dest or address[0] != Mode.DIRECT or amount[0] != Mode.IMMEDIATE:
+        return None
+    return address[1], amount[1] if code.opcode == 'ADD' else -amount[1]
+
+def _jump_target(code):
+    if code.opcode not in JUMP_TARGETS:
+        return None
+    mode, target = code.operands[JUMP_TARGETS[code.opcode]]
+    return target if mode == Mode.DIRECT else None
+
+def _next_kept(keep):
+    next_kept = [len(keep)] * (len(keep) + 1)
+    for i in range(len(keep) - 1, -1, -1):
+        next_kept[i] = i if keep[i] else next_kept[i + 1]
+    return next_kept
+
+# Merges runs of adjustments to the same address (pushes undone by pops
+# cancel out) and removes jumps to the next instruction. address_lines are
+# the instructions pushing a return address as immediate lineno, which are remapped
+# together with the JP and JPF targets. A run is split at every jump target
+# so that no jump lands inside a merged instruction.
+def optimize(pb, address_lines=()):
+    code = list(pb)
+    targets = set()
+    for instruction in code:
+        target = _jump_target(instruction)
+        if target is not None:
+            targets.add(target)
+    for lineno in address_lines:
+        targets.add(code[lineno].operands[0][1])
+
+    keep = [True] * len(code)
+    i = 0
+    while i < len(code):
+        adjustment = _adjustment(code[i])
+        i += 1
+        if adjustment is None:
+            continue
+        first = i - 1
+        address, total = adjustment
+        while i < len(code) and i not in targets:
+            adjustment = _adjustment(code[i])
+            if adjustment is None or adjustment[0] != address:
+                break
+            total += adjustment[1]
+            keep[i] = False
+            i += 1
+        if total == 0:
+            keep[first] = False
+        elif i - first > 1:
+            code[first] = Instruction('ADD' if total > 0 else 'SUB', direct(address),
+                                      immediate(abs(total)), direct(address))
+
+    changed = True
+    while changed:
+        changed = False
+        next_kept = _next_kept(keep)
+        for i, instruction in enumerate(code):
+            if keep[i] and instruction.opcode == 'JP':
+                target = _jump_target(instruction)
+                if target is not None and next_kept[min(target, len(code))] == next_kept[i + 1]:
+                    keep[i] = False
+                    changed = True
+
+    new_lineno = [0] * (len(code) + 1)
+    for i in range(len(code)):
+        new_lineno[i + 1] = new_lineno[i] + keep[i]
+
+    for i, instruction in enumerate(code):
+        target = _jump_target(instruction)
+        if target is not None:
+            code[i] = instruction.replace(JUMP_TARGETS[instruction.opcode],
+                                          direct(new_lineno[min(target, len(code))]))
+    for lineno in address_lines:
+        target = code[lineno].operands[0][1]
+        code[lineno] = code[lineno].replace(0, immediate(new_lineno[min(target, len(code))]))
+    return [code[i] for i in range(len(code)) if keep[i]]
@@ -0,0 +1,107 @@
+import re
+from utils.scanner import BaseScanner
+from utils.token import Token, Character
+from utils.error import (
+    InvalidInputError, UnclosedCommentError, UnmatchedCommentError, InvalidNumberError
+)
+
+def _char_class(chars):
+    return '[' + re.escape(chars) + ']'
+
+DIGIT = _char_class(Character.digits)
+LETTER = _char_class(Character.letters)
+ALPHANUMERIC = _char_class(Character.alphanumeric)
+WHITESPACE = _char_class(Character.whitespace)
+PRINTABLE = _char_class(Character.all)
+NON_PRINTABLE = '[^' + re.escape(Character.all) + ']'
+# Characters the DFA accepts as the lookahead ending a token
+AFTER_NUM = _char_class(Character.whitespace + Character.symbols)
+AFTER_ID = AFTER_NUM
+AFTER_SYM = _char_class(Character.digits + Character.nondigits)
+SINGLE_SYMBOLS = _char_class(''.join(c for c in Character.symbols if c not in '/*='))
+ANY = r'(?s:.)'
+END = r'\Z'
+
+# Mirrors the transitions of utils.dfa.DFA, the first matching group wins.
+# Groups ending in EOF match tokens cut off by the end of input, which the
+# DFA drops silently before returning the final DOLLAR token.
+MASTER_PATTERN = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in [
+    ('COMMENT', rf'/\*{PRINTABLE}*?\*/'),
+    ('COMMENT_INVALID', rf'/\*{PRINTABLE}*?{NON_PRINTABLE}'),
+    ('COMMENT_UNCLOSED', rf'/\*{PRINTABLE}*{END}'),
+    ('SLASH_EOF', rf'/{END}'),
+    ('SLASH_INVALID', rf'/{ANY}'),
+    ('COMMENT_UNMATCHED', r'\*/'),
+    ('STAR', rf'\*(?={AFTER_SYM})'),
+    ('STAR_EOF', rf'\*{END}'),
+    ('STAR_INVALID', rf'\*{ANY}'),
+    ('NUM', rf'{DIGIT}+(?={AFTER_NUM})'),
+    ('NUM_INVALID', rf'{DIGIT}+{LETTER}'),
+    ('NUM_EOF', rf'{DIGIT}+{END}'),
+    ('NUM_INVALID_INPUT', rf'{DIGIT}+{ANY}'),
+    ('EQUAL', rf'==(?={AFTER_SYM})'),
+    ('EQUAL_EOF', rf'=={END}'),
+    ('EQUAL_INVALID', rf'=={ANY}'),
+    ('ASSIGN', rf'=(?={AFTER_SYM})'),
+    ('ASSIGN_EOF', rf'={END}'),
+    ('ASSIGN_INVALID', rf'={ANY}'),
+    ('SYMBOL', SINGLE_SYMBOLS),
+    ('KEY', rf'{LETTER}{ALPHANUMERIC}*(?={AFTER_ID})'),
+    ('KEY_EOF', rf'{LETTER}{ALPHANUMERIC}*{END}'),
+    ('KEY_INVALID', rf'{LETTER}{ALPHANUMERIC}*{ANY}'),
+    ('WHITESPACE', rf'{WHITESPACE}+(?!{WHITESPACE})(?={PRINTABLE})'),
+    ('WHITESPACE_EOF', rf'{WHITESPACE}+{END}'),
+    ('WHITESPACE_INVALID', rf'{WHITESPACE}+{ANY}'),
+    ('INVALID', ANY),
+]))
+
+class RegexScanner(BaseScanner):
+    token_types = {
+        'COMMENT': Token.COMMENT,
+        'STAR': Token.SYMBOL,
+        'NUM': Token.NUM,
+        'EQUAL': Token.SYMBOL,
+        'ASSIGN': Token.SYMBOL,
+        'SYMBOL': Token.SYMBOL,
+        'KEY': Token.KEYWORD,
+        'WHITESPACE': Token.WHITESPACE,
+    }
+
+    errors = {
+        'COMMENT_INVALID': InvalidInputError,
+        'SLASH_INVALID': InvalidInputError,
+        'COMMENT_UNMATCHED': UnmatchedCommentError,
+        'STAR_INVALID': InvalidInputError,
+        'NUM_INVALID': InvalidNumberError,
+        'NUM_INVALID_INPUT': InvalidInputError,
+        'EQUAL_INVALID': InvalidInputError,
+        'ASSIGN_INVALID': InvalidInputError,
+        'KEY_INVALID': InvalidInputError,
+        'WHITESPACE_INVALID': InvalidInputError,
+        'INVALID': InvalidInputError,
+    }
+
+    # Matches are made on the current chunk, a match reaching the end of the
+    # chunk may continue in the next one so it is retried after reading more
+    def _match(self):
+        match = MASTER_PATTERN.match(self.text, self.pos)
+        while (match is None or match.end() == len(self.text)) and self._read_chunk():
+            match = MASTER_PATTERN.match(self.text, self.pos)
+        return match
+
+    # returns (Token Type, Token Str, EOF)
+    def get_next_token(self):
+        self.start = self.pos
+        match = self._match()
+        if match is None:
+            return (Token.DOLLAR, '$', True)
+        token_name = match.lastgroup
+        self.pos = match.end()
+        lexeme = self._get_lexeme()
+        if token_name in self.errors:
+            raise self.errors[token_name](lexeme)
+        elif token_name == 'COMMENT_UNCLOSED':
+            raise UnclosedCommentError(lexeme[:7] + '...')
+        elif token_name not in self.token_types:
+            return (Token.DOLLAR, '$', True)
+        return self._get_token(self.token_types[token_name], lexeme)
@@ -4,25 +4,50 @@ from utils.error import (
     InvalidInputError, UnclosedCommentError, UnmatchedCommentError, InvalidNumberError
 )
 
-class Scanner:
+class BaseScanner:
+    CHUNK_SIZE = 1 << 16
+
     def __init__(self, file):
         self.file = file
         self.lineno = 1
-        self.dfa = DFA()
-        self.buffer = ''
-        self.last_char = None
-        self.is_lookahead = False
+        # Lexemes are slices text[start:pos] of the current chunk
+        self.text = ''
+        self.start = 0
+        self.pos = 0
         self.lexemes = set(Character.keywords)
 
-    def _next_char(self):
-        if not self.is_lookahead:
-            return self.file.read(1)
-        self.is_lookahead = False
-        return self.last_char
+    def _read_chunk(self):
+        chunk = self.file.read(self.CHUNK_SIZE)
+        self.text = self.text[self.start:] + chunk
+        self.pos -= self.start
+        self.start = 0
+        return chunk
+
+    def _get_lexeme(self):
+        self.lineno += self.text.count('\n', self.start, self.pos)
+        return self.text[self.start:self.pos]
+
+    def _get_token(self, token_type, lexeme):
+        if token_type == Token.KEYWORD and lexeme not in Character.keywords:
+            token_type = Token.ID
+        if token_type == Token.KEYWORD or token_type == Token.ID:
+            self.lexemes.add(lexeme)
+        return (token_type, lexeme, False)
+
+    def get_lineno(self):
+        return self.lineno
+
+    def get_lexemes(self):
+        return self.lexemes
+
+class Scanner(BaseScanner):
+    def __init__(self, file):
+        super().__init__(file)
+        self.dfa = DFA()
 
     def _reset(self):
         self.dfa.reset()
-        self.buffer = ''
+        self.start = self.pos
 
     def _raise_error(self, text):
         current_state = self.dfa.get_current_state()
@@ -36,43 +61,17 @@ class Scanner:
         elif current_state == self.dfa.States.NUM_INVALID:
             raise InvalidNumberError(text)
 
-    def _proceed(self, char):
-        self.dfa.proceed(char)
-        self.last_char = char
-        self.is_lookahead = self.dfa.is_lookahead()
-        if not self.is_lookahead:
-            self.lineno += (self.last_char == '\n')
-            self.buffer += self.last_char
-        return self.last_char
-
-    def get_lineno(self):
-        return self.lineno
-    
-    def get_lexemes(self):
-        return self.lexemes
-
-    def get_token_type(self):
-        token_type = self.dfa.get_token_type()
-        if token_type == Token.KEYWORD and self.buffer in Character.keywords:
-            return Token.KEYWORD
-        elif token_type != Token.KEYWORD:
-            return token_type
-        else:
-            return Token.ID
-
     # returns (Token Type, Token Str, EOF)
     def get_next_token(self):
         self._reset()
         while not self.dfa.has_error() and not self.dfa.is_final():
-            char = self._next_char()
-            if not char:
+            if self.pos == len(self.text) and not self._read_chunk():
+                lexeme = self._get_lexeme()
                 if self.dfa.is_acceptable():
                     return (Token.DOLLAR, '$', True)
-                self._raise_error(self.buffer)
-            self._proceed(char)
+                self._raise_error(lexeme)
+            self.pos = self.dfa.run(self.text, self.pos)
+        lexeme = self._get_lexeme()
         if self.dfa.has_error():
-            self._raise_error(self.buffer)
-        token_type = self.get_token_type()
-        if token_type == Token.KEYWORD or token_type == Token.ID:
-            self.lexemes.add(self.buffer)
-        return (token_type, self.buffer, False)
\ No newline at end of file
+            self._raise_error(lexeme)
+        return self._get_token(self.dfa.get_token_type(), lexeme)
\ No newline at end of file
@@ -0,0 +1,337 @@
+from utils.codegen import CodeGenerator
+from utils.instruction import Instruction, Mode, immediate, direct, indirect
+
+class TempCodeGenerator(CodeGenerator):
+
+    # Expression results live in fixed temporaries placed where the stack
+    # used to start, the stack is moved above the highest temporary used.
+    # Values are kept as operands: immediate n for constants, a direct
+    # temporary for computed values and a direct global address or an
+    # indirect t (t holding the address) for variables, which are only read
+    # when consumed. The stack
+    # is only used for call frames: live temporaries are pushed before a
+    # call and popped back once it returns.
+    TEMPS = CodeGenerator.STACK
+
+    def reset(self):
+        super().reset()
+        self.operands = []
+        self.free_temps = []
+        self.temp_count = 0
+        self.conditions = {}
+        self.saved_operands = {}
+
+    def get_registers(self):
+        return super().get_registers() + tuple(range(self.TEMPS, self.TEMPS + 4 * self.temp_count, 4))
+
+    def _new_temp(self):
+        if self.free_temps:
+            return self.free_temps.pop()
+        self.temp_count += 1
+        return self.TEMPS + 4 * (self.temp_count - 1)
+
+    def _owned_temp(self, operand):
+        mode, address = operand
+        if mode == Mode.IMMEDIATE:
+            return None
+        if self.TEMPS <= address < self.TEMPS + 4 * self.temp_count:
+            return address
+        return None
+
+    def _is_lazy(self, operand):
+        return operand[0] == Mode.INDIRECT or (operand[0] == Mode.DIRECT and self._owned_temp(operand) is None)
+
+    def _free(self, operand):
+        temp = self._owned_temp(operand)
+        if temp is not None:
+            self.free_temps.append(temp)
+            self.free_temps.sort(reverse=True)
+
+    def _result_temp(self, *operands):
+        temps = [self._owned_temp(operand) for operand in operands]
+        owned = [temp for temp in temps if temp is not None]
+        for temp in owned[1:]:
+            self.free_temps.append(temp)
+        self.free_temps.sort(reverse=True)
+        return owned[0] if owned else self._new_temp()
+
+    def _push_operand(self, operand):
+        self.operands.append(operand)
+
+    def _pop_operand(self):
+        return self.operands.pop() if self.operands else immediate(0)
+
+    # Reads the variables still waiting on the operand stack before an
+    # assignment can change them
+    def _materialize(self):
+        for i, operand in enumerate(self.operands):
+            if self._is_lazy(operand):
+                temp = self._owned_temp(operand)
+                if temp is None:
+                    temp = self._new_temp()
+                self.emit('ASSIGN', operand, direct(temp))
+                self.operands[i] = direct(temp)
+
+    def _push_stack(self, lookahead, input_lineno):
+        token = self.SS.pop()
+        if token.isdigit():
+            self._push_operand(immediate(int(token)))
+            self.SS.append('int')
+        else:
+            symbol = self.func_table.get_symbol(token)
+            if symbol is None:
+                symbol = self.global_table.get_symbol(token)
+                if symbol is None:
+                    self.add_semantic_error(f'\'{token}\' is not defined.', input_lineno)
+                    self._push_operand(immediate(0))
+                    self.SS.append('int')
+                    return
+                else:
+                    self._push_operand(direct(symbol[0]) if symbol[1] is None else immediate(symbol[0]))
+            else:
+                temp = self._new_temp()
+                self.emit('ADD', direct(self.FP), immediate(symbol[0]), direct(temp))
+                self._push_operand(indirect(temp) if symbol[1] is None or symbol[2] else direct(temp))
+            self.SS.append('int' if symbol[1] is None else 'array')
+
+    def _pop_stack(self, lookahead, input_lineno):
+        # The condition is read by the JPF filled into the next skipped line
+        operand = self._pop_operand()
+        self.conditions[len(self.PB)] = operand
+        self._free(operand)
+        self.SS.pop()
+
+    def _assign(self, lookahead, input_lineno):
+        rhs_type = self.SS.pop()
+        name = self.SS.pop()
+        symbol = self.func_table.get_symbol(name)
+        value = self._pop_operand()
+        if symbol is None:
+            symbol = self.global_table.get_symbol(name)
+            if symbol is None:
+                self.add_semantic_error(f'\'{name}\' is not defined.', input_lineno)
+                self._free(value)
+                self._push_operand(immediate(0))
+                self.SS.append('int')
+                return
+            else:
+                self._materialize()
+                self.emit('ASSIGN', value, direct(symbol[0]))
+                result = direct(symbol[0])
+        else:
+            self._materialize()
+            temp = self._new_temp()
+            self.emit('ADD', direct(self.FP), immediate(symbol[0]), direct(temp))
+            self.emit('ASSIGN', value, indirect(temp))
+            result = indirect(temp)
+        self._free(value)
+        lhs_type = 'int' if symbol[1] is None else 'array'
+        if rhs_type != lhs_type:
+            self.add_semantic_error(f'Type mismatch in operands, Got {lhs_type} instead of {rhs_type}.', input_lineno)
+        self._push_operand(result)
+        self.SS.append(rhs_type)
+
+    def _operation(self, lookahead, input_lineno):
+        opr_type1 = self.SS.pop()
+        opr = self.SS.pop()
+        opr_type2 = self.SS.pop()
+        if opr_type1 != opr_type2:
+            self.add_semantic_error(f'Type mismatch in operands, Got array instead of int.', input_lineno)
+        right = self._pop_operand()
+        left = self._pop_operand()
+        self.SS.append('int')
+        if left[0] == Mode.IMMEDIATE and right[0] == Mode.IMMEDIATE:
+            self._push_operand(immediate(self.fold(opr, left[1], right[1])))
+            return
+        # x + 0, 0 + x, x - 0, x * 1 and 1 * x are x
+        if (opr in '+-' and right == immediate(0)) or (opr == '*' and right == immediate(1)):
+            self._push_operand(left)
+            return
+        if (opr == '+' and left == immediate(0)) or (opr == '*' and left == immediate(1)):
+            self._push_operand(right)
+            return
+        opr_code = ('ADD' if opr == '+' else \
+                    'SUB' if opr == '-' else \
+                    'MULT' if opr == '*' else \
+                    'LT' if opr == '<' else 'EQ')
+        temp = self._result_temp(left, right)
+        self.emit(opr_code, left, right, direct(temp))
+        self._push_operand(direct(temp))
+
+    def _negate(self, lookahead, input_lineno):
+        type = self.SS.pop()
+        if type != 'int':
+            self.add_semantic_error(f'Type mismatch in operands, Got array instead of int.', input_lineno)
+        operand = self._pop_operand()
+        self.SS.append('int')
+        if operand[0] == Mode.IMMEDIATE:
+            self._push_operand(immediate(-operand[1]))
+            return
+        temp = self._result_temp(operand)
+        self.emit('SUB', immediate(0), operand, direct(temp))
+        self._push_operand(direct(temp))
+
+    # Statement level line numbers are taken with no operand pending, so
+    # pending operands mean this is the start of a call inside an expression
+    def _push_lineno(self, lookahead, input_lineno):
+        saved = []
+        if self.operands and self.SS[-1] != 'output':
+            for i, operand in enumerate(self.operands):
+                if operand[0] != Mode.IMMEDIATE:
+                    self.push_code(operand)
+                    saved.append(i)
+        lineno = len(self.PB)
+        if saved:
+            self.saved_operands[lineno] = saved
+        self.SS.append(lineno)
+
+    def _restore_operands(self, pb_lineno):
+        for i in reversed(self.saved_operands.pop(pb_lineno, [])):
+            operand = self.operands[i]
+            temp = self._owned_temp(operand)
+            if temp is None:
+                temp = self._new_temp()
+            self.pop_code()
+            self.emit('ASSIGN', indirect(self.SP), direct(temp))
+            self.operands[i] = direct(temp)
+
+    def _jpf_from_skipped1(self, lookahead, input_lineno):
+        pb_lineno = self.SS.pop()
+        lineno = len(self.PB)
+        self.PB[pb_lineno] = Instruction('JPF', self.conditions.pop(pb_lineno, immediate(0)), direct(lineno))
+
+    def _jpf_from_skipped2(self, lookahead, input_lineno):
+        pb_lineno = self.SS.pop(-2)
+        lineno = len(self.PB)
+        self.PB[pb_lineno] = Instruction('JPF', self.conditions.pop(pb_lineno, immediate(0)), direct(lineno))
+
+    def _call_func(self, lookahead, input_lineno):
+        args = []
+        while self.SS[-1] != 'begin-args':
+            args.append(self.SS.pop())
+        args.reverse()
+        self.SS.pop()
+        pb_lineno = self.SS.pop()
+        func_name = self.SS.pop()
+        func = self.funcs[func_name]
+        if len(args) != len(func[2]):
+            self.add_semantic_error(f'Mismatch in numbers of arguments of \'{func_name}\'.', input_lineno)
+        func_param_types = [param[1] for param in func[2]]
+        for i in range(len(args)):
+            if i >= len(func[2]): break
+            arg = args[i]
+            expected = func_param_types[i]
+            if arg != expected:
+                self.add_semantic_error(f'Mismatch in type of argument {i+1} of \'{func_name}\'. Expected \'{expected}\' but got \'{arg}\' instead.', input_lineno)
+        arg_operands = [self._pop_operand() for _ in args]
+        arg_operands.reverse()
+        if func_name == 'output':
+            self._output(pb_lineno, arg_operands)
+            return
+        self.set_push_code(pb_lineno, None)
+        for operand in arg_operands:
+            self.push_code(operand)
+            self._free(operand)
+        self.emit('SUB', direct(self.SP), immediate(4 * len(func[2])), direct(self.FP))
+        self.emit('JP', direct(func[1]))
+        lineno = len(self.PB)
+        self.set_push_code(pb_lineno+1, immediate(lineno))
+        self.address_lines.append(pb_lineno+1)
+        self.pop_code()
+        if func[0] == 'void':
+            result = immediate(0)
+        else:
+            result = direct(self._new_temp())
+            self.emit('ASSIGN', indirect(self.SP), result)
+            self.last_call = (pb_lineno, lineno - 2, len(self.PB), func_name, 'array' in args, result)
+        self._restore_operands(pb_lineno)
+        self._push_operand(result)
+        self.SS.append('int')
+
+    def _call_main(self, lookahead, input_lineno):
+        super()._call_main(lookahead, input_lineno)
+        stack = self.TEMPS + 4 * self.temp_count
+        self.PB[0] = Instruction('ASSIGN', immediate(stack), direct(self.SP))
+        self.PB[1] = Instruction('ASSIGN', immediate(stack), direct(self.FP))
+
+    def _push_fp_value(self, lookahead, input_lineno):
+        if len(self.SS) < 2 or self.SS[-2] != 'output':
+            super()._push_fp_value(lookahead, input_lineno)
+
+    def _set_func_return_value(self, lookahead, input_lineno):
+        operand = self._pop_operand()
+        self.SS.pop()
+        if self._tail_call(operand):
+            self._free(operand)
+            return
+        self.emit('SUB', direct(self.FP), immediate(12), direct(self.TEMP))
+        self.emit('ASSIGN', operand, indirect(self.TEMP))
+        self._free(operand)
+
+    def _push_arr_index_addr(self, lookahead, input_lineno):
+        type = self.SS.pop()
+        if type != 'int':
+            self.add_semantic_error(f'Type mismatch in operands, Got array instead of int.', input_lineno)
+        token = self.SS.pop()
+        symbol = self.func_table.get_symbol(token)
+        index = self._pop_operand()
+        temp = self._result_temp(index)
+        if index[0] == Mode.IMMEDIATE:
+            self._constant_index_addr(symbol, token, 4 * index[1], temp)
+            self._push_operand(direct(temp))
+            self.SS.append('int')
+            return
+        self.emit('MULT', index, immediate(4), direct(temp))
+        if symbol is None:
+            symbol = self.global_table.get_symbol(token)
+            self.emit('ADD', immediate(symbol[0]), direct(temp), direct(temp))
+        else:
+            self.emit('ADD', direct(self.FP), immediate(symbol[0]), direct(self.TEMP))
+            if symbol[2]:
+                self.emit('ADD', indirect(self.TEMP), direct(temp), direct(temp))
+            else:
+                self.emit('ADD', direct(self.TEMP), direct(temp), direct(temp))
+        self._push_operand(direct(temp))
+        self.SS.append('int')
+
+    def _constant_index_addr(self, symbol, token, offset, temp):
+        if symbol is None:
+            symbol = self.global_table.get_symbol(token)
+            self.emit('ASSIGN', immediate(symbol[0] + offset), direct(temp))
+        else:
+            self.emit('ADD', direct(self.FP), immediate(symbol[0]), direct(self.TEMP))
+            if symbol[2]:
+                self.emit('ADD', indirect(self.TEMP), immediate(offset), direct(temp))
+            else:
+                self.emit('ADD', direct(self.TEMP), immediate(offset), direct(temp))
+
+    def _push_addr_value(self, lookahead, input_lineno):
+        address = self._pop_operand()
+        self._push_operand(indirect(address[1]))
+
+    def _arr_assign(self, lookahead, input_lineno):
+        rhs_type = self.SS.pop()
+        self.SS.pop()
+        if rhs_type != 'int':
+            self.add_semantic_error(f'Type mismatch in operands, Got array instead of int.', input_lineno)
+        value = self._pop_operand()
+        address = self._pop_operand()
+        self._materialize()
+        self.emit('ASSIGN', value, indirect(address[1]))
+        self._free(value)
+        self._push_operand(indirect(address[1]))
+        self.SS.append('int')
+
+    def _pop_ss(self, lookahead, input_lineno):
+        self.SS.pop()
+        self._free(self._pop_operand())
+
+    def _output(self, pb_lineno, arg_operands):
+        self.PB[pb_lineno] = Instruction('JP', direct(pb_lineno + 3))
+        self.PB[pb_lineno+1] = Instruction('ASSIGN', direct(0), direct(0))
+        self.PB[pb_lineno+2] = Instruction('ASSIGN', direct(0), direct(0))
+        for operand in arg_operands:
+            self.emit('PRINT', operand)
+            self._free(operand)
+        self._push_operand(immediate(0))
+        self.SS.append('int')